@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, CheckConstraint, text, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from datetime import datetime
 import os
 from pathlib import Path
@@ -12,7 +13,28 @@ DATA_DIR.mkdir(exist_ok=True)
 
 DATABASE_URL = f"sqlite+aiosqlite:///{DATA_DIR}/app.db"
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+# Shared connection pool so concurrent SSE streams and background jobs reuse connections
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True,
+    pool_recycle=1800
+)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside a writer; NORMAL sync skips the per-commit fsync of the WAL"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -44,7 +66,7 @@ class Job(Base):
         CheckConstraint("status IN ('queued', 'running', 'succeeded', 'failed', 'canceled')"),
         default='queued'
     )
-    started_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, default=datetime.utcnow, index=True)
     finished_at = Column(DateTime, nullable=True)
     prompts_file_id = Column(Integer, ForeignKey("prompts_files.id"))
     base_prompt_snapshot = Column(Text)
@@ -115,7 +137,7 @@ class ResearchSession(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
-    status = Column(String, default='active')  # active, completed, failed
+    status = Column(String, default='active')  # active, running, completed, failed
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     completed_at = Column(DateTime, nullable=True)
     result_path = Column(String, nullable=True)
@@ -128,13 +150,21 @@ class ResearchMessage(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("research_sessions.id"), index=True)
-    role = Column(String, nullable=False)  # user, assistant, system
+    role = Column(String, nullable=False)  # user, assistant, system, thinking, web_search
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     session = relationship("ResearchSession", back_populates="messages")
 
 
+class ResearchCache(Base):
+    __tablename__ = "research_cache"
+
+    key = Column(String, primary_key=True)  # blake2b of the normalized user query
+    report = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class DeconstructUpload(Base):
     __tablename__ = "deconstruct_uploads"
 
@@ -149,6 +179,14 @@ async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+        # create_all only creates indexes along with new tables, so add this one
+        # to databases created before jobs.started_at was indexed
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_jobs_started_at ON jobs (started_at)"))
+
+        # A research stream claims its session as 'running' until it ends; claims left
+        # by a previous process can never be released, so reopen those sessions
+        await conn.execute(text("UPDATE research_sessions SET status = 'active' WHERE status = 'running'"))
+
         # Insert default config values if they don't exist
         async with AsyncSessionLocal() as session:
             from sqlalchemy import select
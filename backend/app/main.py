@@ -1,19 +1,63 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.middleware.gzip import GZipResponder
+from starlette.datastructures import Headers
 from contextlib import asynccontextmanager
 
 from .database import init_db
+from .services.openai_client import close_openai_clients
 from .routes import prompts, jobs, images, zips, config, events, prompt_generator, research, deconstruct
 
 
+# Responses with these content types are never gzipped: ZIPs and images are already
+# compressed, and SSE streams must reach the client event by event
+GZIP_SKIP_CONTENT_TYPES = ("application/zip", "image/", "text/event-stream")
+
+# Only bother compressing bodies at least this large
+GZIP_MINIMUM_SIZE = 1024
+
+
+class _SelectiveGZipResponder(GZipResponder):
+    """GZipResponder that passes skipped content types and partial content through untouched"""
+
+    async def send_with_gzip(self, message):
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if message["status"] == 206 or content_type.startswith(GZIP_SKIP_CONTENT_TYPES):
+                # Same pass-through path GZipResponder uses when Content-Encoding is already set
+                self.initial_message = message
+                self.content_encoding_set = True
+                return
+        await super().send_with_gzip(message)
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """Gzip JSON and text responses, leaving ZIP, image and SSE responses alone"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = _SelectiveGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup"""
+    """Initialize database on startup and close shared OpenAI clients on shutdown"""
     await init_db()
     yield
+    await close_openai_clients()
 
 
-app = FastAPI(title="StickerPrint API", version="1.0.0", lifespan=lifespan)
+app = FastAPI(
+    title="StickerPrint API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 # CORS middleware
 app.add_middleware(
@@ -24,6 +68,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON/text responses for clients that accept gzip
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
 # Include routers
 app.include_router(prompts.router)
 app.include_router(jobs.router)
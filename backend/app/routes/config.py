@@ -6,6 +6,7 @@ from datetime import datetime
 from typing import Optional
 
 from ..database import get_db, AppConfig
+from ..services.config_cache import invalidate_config
 
 router = APIRouter(prefix="/api/config", tags=["config"])
 
@@ -146,6 +147,7 @@ async def update_config(
         updated_keys.append("prompt_designer_template")
 
     await db.commit()
+    invalidate_config(*updated_keys)
 
     return {
         "success": True,
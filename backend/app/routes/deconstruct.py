@@ -8,6 +8,7 @@ import base64
 from pathlib import Path
 
 from ..database import get_db, AppConfig, DeconstructUpload, GeneratedPromptFile
+from ..services.openai_client import get_openai_client
 
 router = APIRouter(prefix="/api/deconstruct", tags=["deconstruct"])
 
@@ -90,8 +91,7 @@ async def analyze_images(
     if not api_key:
         raise HTTPException(status_code=400, detail="API key not configured")
 
-    from openai import AsyncOpenAI
-    client = AsyncOpenAI(api_key=api_key)
+    client = get_openai_client(api_key)
 
     results = []
     prompts_text = []
@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from sse_starlette.sse import EventSourceResponse
 import asyncio
-import json
+import orjson
 
 router = APIRouter(prefix="/api", tags=["events"])
 
@@ -19,7 +19,7 @@ async def event_generator():
             event = await queue.get()
             yield {
                 "event": event["type"],
-                "data": json.dumps(event["data"])
+                "data": event["data"]
             }
     except asyncio.CancelledError:
         event_subscribers.remove(queue)
@@ -33,7 +33,8 @@ async def sse_endpoint():
 
 async def broadcast_event(event_type: str, data: dict):
     """Broadcast an event to all SSE subscribers"""
-    event = {"type": event_type, "data": data}
+    # Serialize once here rather than once per subscriber
+    event = {"type": event_type, "data": orjson.dumps(data).decode()}
 
     for queue in event_subscribers:
         try:
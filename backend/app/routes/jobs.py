@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, update, func
 from pydantic import BaseModel
 from datetime import datetime
 from pathlib import Path
-import json
+from typing import Optional
+import orjson
+import asyncio
 
 from ..database import get_db, Job, PromptsFile, Image, AppConfig, PromptQueue, GeneratedPromptFile
 from ..services.image_generator import ImageGeneratorService
@@ -25,6 +27,21 @@ async def process_next_prompt_queue(db: AsyncSession):
         return False
 
 
+def _read_prompts(path: str) -> list[str]:
+    """Read non-empty prompt lines from a prompts file"""
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _count_prompts(path: str) -> int:
+    """Count non-empty prompt lines without keeping them in memory"""
+    try:
+        with open(path, 'r') as f:
+            return sum(1 for line in f if line.strip())
+    except Exception:
+        return 0
+
+
 class CreateJobRequest(BaseModel):
     prompts_file_id: int
 
@@ -50,13 +67,14 @@ async def job_image_generation(job_id: int):
 
         if not prompts_file:
             return
+        # Plain int for the failure path: rollback expires the ORM instance
+        prompts_file_id = prompts_file.id
 
-        # Read prompts from file
-        with open(prompts_file.path, 'r') as f:
-            prompts = [line.strip() for line in f if line.strip()]
+        # Read prompts from file without blocking the event loop
+        prompts = await asyncio.to_thread(_read_prompts, prompts_file.path)
 
         # Get config snapshot
-        config = json.loads(job.config_snapshot)
+        config = orjson.loads(job.config_snapshot)
         base_prompt = config.get('base_prompt', '')
         api_key = config.get('api_key', '')
 
@@ -74,23 +92,19 @@ async def job_image_generation(job_id: int):
 
         except Exception as e:
             print(f"Error generating images: {str(e)}")
-            result = await db.execute(
-                select(Job).where(Job.id == job_id)
-            )
-            job = result.scalar_one_or_none()
-            if job:
-                job.status = "failed"
-                job.finished_at = datetime.utcnow()
-
-                # Mark prompts file as completed
-                result = await db.execute(
-                    select(PromptsFile).where(PromptsFile.id == job.prompts_file_id)
-                )
-                prompts_file = result.scalar_one_or_none()
-                if prompts_file:
-                    prompts_file.status = 'completed'
+            await db.rollback()
 
-                await db.commit()
+            # Mark job as failed and prompts file as completed without re-reading the rows
+            await db.execute(
+                update(Job).where(Job.id == job_id).values(
+                    status="failed",
+                    finished_at=datetime.utcnow()
+                )
+            )
+            await db.execute(
+                update(PromptsFile).where(PromptsFile.id == prompts_file_id).values(status='completed')
+            )
+            await db.commit()
 
         # After job completes (success or failure), try to process next item in prompt queue
         await process_next_prompt_queue(db)
@@ -133,7 +147,7 @@ async def create_job(
         started_at=datetime.utcnow(),
         prompts_file_id=request.prompts_file_id,
         base_prompt_snapshot=config_snapshot.get('base_prompt', ''),
-        config_snapshot=json.dumps(config_snapshot)
+        config_snapshot=orjson.dumps(config_snapshot).decode()
     )
 
     db.add(job)
@@ -160,38 +174,52 @@ async def create_job(
 @router.get("")
 async def list_jobs(
     limit: int = 50,
+    before: Optional[datetime] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """List all jobs"""
+    """List jobs, newest first; pass the last started_at as before for the next page"""
+    query = select(Job)
+    if before is not None:
+        query = query.where(Job.started_at < before)
     result = await db.execute(
-        select(Job).order_by(Job.started_at.desc()).limit(limit)
+        query.order_by(Job.started_at.desc()).limit(limit)
     )
     jobs = result.scalars().all()
 
-    # Get image counts and prompts file info for each job
+    # Get image counts for all listed jobs in one grouped query
+    job_ids = [job.id for job in jobs]
+    result = await db.execute(
+        select(Image.job_id, func.count(Image.id))
+        .where(Image.job_id.in_(job_ids))
+        .group_by(Image.job_id)
+    )
+    image_counts = dict(result.all())
+
+    # Get prompts file info for all listed jobs in one query
+    result = await db.execute(
+        select(PromptsFile).where(PromptsFile.id.in_([job.prompts_file_id for job in jobs]))
+    )
+    prompts_files = {pf.id: pf for pf in result.scalars().all()}
+
+    # Count prompts in each file once, off the event loop
+    prompt_counts = dict(zip(
+        prompts_files,
+        await asyncio.gather(*(
+            asyncio.to_thread(_count_prompts, pf.path) for pf in prompts_files.values()
+        ))
+    ))
+
     job_list = []
     for job in jobs:
-        result = await db.execute(
-            select(func.count(Image.id)).where(Image.job_id == job.id)
-        )
-        image_count = result.scalar()
-
-        # Get prompts file info
-        prompts_file_result = await db.execute(
-            select(PromptsFile).where(PromptsFile.id == job.prompts_file_id)
-        )
-        prompts_file = prompts_file_result.scalar_one_or_none()
+        image_count = image_counts.get(job.id, 0)
+        prompts_file = prompts_files.get(job.prompts_file_id)
 
         # Count total prompts in the file
         total_prompts = 0
         prompts_file_name = None
         if prompts_file:
             prompts_file_name = prompts_file.filename
-            try:
-                with open(prompts_file.path, 'r') as f:
-                    total_prompts = len([line.strip() for line in f if line.strip()])
-            except:
-                total_prompts = 0
+            total_prompts = prompt_counts[prompts_file.id]
 
         job_list.append({
             "id": job.id,
@@ -236,11 +264,7 @@ async def get_job(job_id: int, db: AsyncSession = Depends(get_db)):
     prompts_file_name = None
     if prompts_file:
         prompts_file_name = prompts_file.filename
-        try:
-            with open(prompts_file.path, 'r') as f:
-                total_prompts = len([line.strip() for line in f if line.strip()])
-        except:
-            total_prompts = 0
+        total_prompts = await asyncio.to_thread(_count_prompts, prompts_file.path)
 
     response = {
         "id": job.id,
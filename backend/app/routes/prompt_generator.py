@@ -7,10 +7,10 @@ from pathlib import Path
 import re
 import hashlib
 import shutil
-from openai import AsyncOpenAI
 from typing import Optional
 
 from ..database import get_db, AppConfig, GeneratedPromptFile, PromptsFile, PromptQueue
+from ..services.openai_client import get_openai_client
 
 router = APIRouter(prefix="/api/prompt-generator", tags=["prompt-generator"])
 
@@ -165,7 +165,7 @@ async def generate_prompts(
 
     try:
         # Step 1: Generate a descriptive filename using GPT-4o
-        client = AsyncOpenAI(api_key=api_key)
+        client = get_openai_client(api_key)
 
         filename_prompt = f"""Based on this demographic research, create a short, descriptive filename of 1-4 words that captures the target audience or theme. Use only lowercase letters, numbers, and underscores. No file extension.
 
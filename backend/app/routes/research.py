@@ -1,22 +1,212 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, insert, update, delete, func, desc
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Optional
+from collections import OrderedDict
 from sse_starlette.sse import EventSourceResponse
-import json
+from starlette.background import BackgroundTask
+import os
+import orjson
+import time
+import hashlib
 import asyncio
+import aiofiles
+import anyio
 
-from ..database import get_db, AppConfig, ResearchSession, ResearchMessage, AsyncSessionLocal
+from ..database import get_db, AppConfig, ResearchSession, ResearchMessage, ResearchCache, AsyncSessionLocal
+from ..services.openai_client import get_openai_client
 
 router = APIRouter(prefix="/api/research", tags=["research"])
 
 # Ensure research results directory exists
 RESEARCH_DIR = Path(__file__).parent.parent.parent.parent / "data" / "research"
 RESEARCH_DIR.mkdir(parents=True, exist_ok=True)
+RESEARCH_DIR_STR = str(RESEARCH_DIR)
+
+# SSE keep-alive interval and per-send timeout for research streams
+SSE_PING_SECONDS = 15
+SSE_SEND_TIMEOUT_SECONDS = 30
+
+# Report text is appended to disk in chunks of at least this many characters
+REPORT_WRITE_CHUNK_CHARS = 64 * 1024
+
+# Finished reports are reused for repeat queries within this window
+RESEARCH_CACHE_TTL = timedelta(hours=24)
+
+# Window for batching reasoning steps into one thinking event
+THINKING_FLUSH_SECONDS = 0.1
+
+# Reasoning/search steps are saved in bulk once this many are buffered or this much time has passed
+STEP_FLUSH_ROWS = 25
+STEP_FLUSH_SECONDS = 5.0
+
+# Deletes every ASCII character except [a-z0-9_]; non-ASCII is dropped before translating
+_FILENAME_DELETE_TABLE = str.maketrans('', '', ''.join(
+    chr(c) for c in range(128) if not (chr(c).isdigit() or 'a' <= chr(c) <= 'z' or chr(c) == '_')
+))
+MAX_FILENAME_LENGTH = 64
+
+# Static system prompts sent first so requests share a stable, cacheable prefix
+CLARIFICATION_SYSTEM_PROMPT = "You are a sticker market research specialist. Your goal is to research demographics that purchase stickers to identify potential customers and create detailed profiles for designing targeted sticker image generation prompts.\n\nThe user will provide a simple input like:\n- A type of person (e.g., 'college students', 'nurses', 'gamers')\n- A category (e.g., 'anime fans', 'dog owners', 'skaters')\n- A demographic (e.g., 'Gen Z', 'millennials', 'parents')\n- Or any simple descriptor\n\nYour job: Determine if you have enough to start comprehensive research. Almost always respond with 'CLEAR' and proceed with research. Only ask for clarification if the input is completely ambiguous or impossible to research (e.g., just 'stuff' or nonsensical text).\n\nBe permissive - interpret simple inputs generously and start research. If they say 'gamers', that's enough. If they say 'moms', that's enough. If they say 'Taylor Swift fans', that's enough."
+
+FILENAME_SYSTEM_PROMPT = """Based on the user's research query, create a short, descriptive filename of 1-4 words that captures the topic. Use only lowercase letters, numbers, and underscores. No file extension.
+
+Examples:
+- "climate_change_impact"
+- "ai_healthcare"
+- "quantum_computing"
+- "mars_exploration"
+"""
+
+# LRU cache of per-query LLM results (clarification verdict, filename) keyed by query hash
+QUERY_CACHE_SIZE = 256
+_query_cache: "OrderedDict[str, dict]" = OrderedDict()
+
+
+def _get_query_cache_entry(user_query: str) -> dict:
+    """Get (or create) the cached LLM results for a user query"""
+    key = hashlib.blake2b(user_query.encode('utf-8'), digest_size=16).hexdigest()
+    entry = _query_cache.get(key)
+    if entry is None:
+        entry = _query_cache[key] = {}
+        if len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+    else:
+        _query_cache.move_to_end(key)
+    return entry
+
+
+def _research_cache_key(user_query: str) -> str:
+    """Cache key for a finished report: hash of the whitespace/case-normalized query"""
+    normalized = " ".join(user_query.split()).lower()
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _needs_clarification_check(user_query: str) -> bool:
+    """Queries of 3+ words with letters or digits are clear enough to research"""
+    return len(user_query.split()) < 3 or not any(c.isalnum() for c in user_query)
+
+
+async def _generate_filename_base(client, research_query: str) -> Optional[str]:
+    """Ask a small model for a short descriptive report filename (None on failure)"""
+    try:
+        filename_response = await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": FILENAME_SYSTEM_PROMPT},
+                {"role": "user", "content": f"Query: {research_query[:500]}\n\nFilename:"}
+            ],
+            max_tokens=20,
+            extra_body={"prompt_cache_key": "research-filename-v1"}
+        )
+
+        filename_base = filename_response.choices[0].message.content.strip()
+        # Clean the filename to ensure it's safe (cap length before cleaning)
+        filename_base = (
+            filename_base[:MAX_FILENAME_LENGTH].lower()
+            .encode('ascii', 'ignore').decode('ascii')
+            .translate(_FILENAME_DELETE_TABLE)
+        )
+        if len(filename_base) < 2:
+            return None
+        return filename_base
+    except Exception:
+        return None
+
+
+def _on_reasoning_summary(event, run: dict) -> None:
+    """Reasoning/thinking step (one per completed summary part), buffered for coalescing"""
+    reasoning_text = getattr(event, 'text', None)
+    if not reasoning_text:
+        return None
+    run["collected"].append({"role": "thinking", "content": reasoning_text, "created_at": datetime.utcnow()})
+    if not run["thinking"]:
+        run["thinking_since"] = time.monotonic()
+    run["thinking"].append(reasoning_text)
+
+
+def _flush_thinking(run: dict) -> dict:
+    """Emit buffered reasoning steps as a single thinking event"""
+    texts = run["thinking"]
+    run["thinking"] = []
+    return {"event": "thinking", "data": orjson.dumps({"texts": texts}).decode()}
+
+
+async def _save_collected_steps(db: AsyncSession, session_id: int, run: dict):
+    """Persist buffered reasoning/search steps with a single bulk insert"""
+    if run["collected"]:
+        await db.execute(
+            insert(ResearchMessage),
+            [{"session_id": session_id, **row} for row in run["collected"]]
+        )
+        await db.commit()
+        run["collected"] = []
+    run["collected_saved_at"] = time.monotonic()
+
+
+def _on_output_item_done(event, run: dict) -> Optional[dict]:
+    """Web search calls and page visits"""
+    item = getattr(event, 'item', None)
+    if getattr(item, 'type', None) != "web_search_call":
+        return None
+    action = getattr(item, 'action', None)
+    query = getattr(action, 'query', None)
+    if query:
+        run["collected"].append({"role": "web_search", "content": query, "created_at": datetime.utcnow()})
+        return {"event": "web_search", "data": orjson.dumps({"query": query}).decode()}
+    url = getattr(action, 'url', None)
+    if url:
+        return {"event": "web_page", "data": orjson.dumps({"url": url, "title": url}).decode()}
+    return None
+
+
+def _on_output_text_delta(event, run: dict) -> None:
+    """Final message/report text"""
+    run["report_parts"].append(event.delta)
+    run["unwritten_size"] += len(event.delta)
+
+
+def _on_response_completed(event, run: dict) -> None:
+    """If no text deltas arrived, take the report from the completed response"""
+    if not run["report_parts"]:
+        report = getattr(event.response, 'output_text', '') or ''
+        run["report_parts"].append(report)
+        run["unwritten_size"] += len(report)
+
+
+async def _write_report_parts(report_file, run: dict):
+    """Append report text received since the last write to the report file"""
+    await report_file.write("".join(run["report_parts"][run["written_parts"]:]))
+    run["written_parts"] = len(run["report_parts"])
+    run["unwritten_size"] = 0
+
+
+def _on_response_failed(event, run: dict) -> None:
+    """Surface failed/incomplete responses instead of saving an empty report"""
+    response = getattr(event, 'response', None)
+    error = getattr(response, 'error', None) or getattr(response, 'incomplete_details', None)
+    raise RuntimeError(f"Deep research {event.type.rsplit('.', 1)[-1]}: {error}")
+
+
+def _on_stream_error(event, run: dict) -> None:
+    """Surface errors reported inside the event stream"""
+    raise RuntimeError(f"Deep research stream error: {getattr(event, 'message', 'unknown error')}")
+
+
+# Deep research stream event type -> handler returning an SSE event (or None)
+_STREAM_EVENT_HANDLERS = {
+    "response.reasoning_summary_text.done": _on_reasoning_summary,
+    "response.output_item.done": _on_output_item_done,
+    "response.output_text.delta": _on_output_text_delta,
+    "response.completed": _on_response_completed,
+    "response.failed": _on_response_failed,
+    "response.incomplete": _on_response_failed,
+    "error": _on_stream_error,
+}
 
 
 class CreateSessionRequest(BaseModel):
@@ -61,15 +251,16 @@ async def create_session(
     """Create a new research session"""
 
     # Generate title from query (first 60 chars)
-    title = request.initial_query[:60] + ("..." if len(request.initial_query) > 60 else "")
+    query = request.initial_query
+    title = query if len(query) <= 60 else query[:60] + "..."
 
     session = ResearchSession(
         title=title,
         status='active'
     )
     db.add(session)
-    await db.commit()
-    await db.refresh(session)
+    # Flush to get session.id, then commit session and initial message together
+    await db.flush()
 
     # Add initial user message
     message = ResearchMessage(
@@ -78,6 +269,8 @@ async def create_session(
         content=request.initial_query
     )
     db.add(message)
+    # One COMMIT for both rows; no refresh needed since the session doesn't expire
+    # on commit and its defaults were populated client-side at flush
     await db.commit()
 
     return SessionResponse(
@@ -90,25 +283,31 @@ async def create_session(
     )
 
 
-@router.get("/sessions", response_model=List[SessionResponse])
-async def list_sessions(db: AsyncSession = Depends(get_db)):
-    """List all research sessions"""
-    result = await db.execute(
-        select(ResearchSession).order_by(desc(ResearchSession.created_at))
+# No response_model: rows are returned as-is instead of being re-validated per item;
+# responses= keeps SessionResponse in the OpenAPI schema
+@router.get("/sessions", responses={200: {"model": List[SessionResponse]}})
+async def list_sessions(
+    before: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """List research sessions, newest first; all of them unless a page is asked for via before/limit"""
+    query = select(
+        ResearchSession.id,
+        ResearchSession.title,
+        ResearchSession.status,
+        ResearchSession.created_at,
+        ResearchSession.completed_at,
+        ResearchSession.result_path.is_not(None).label("has_result")
     )
-    sessions = result.scalars().all()
+    if before is not None:
+        query = query.where(ResearchSession.created_at < before)
+    query = query.order_by(desc(ResearchSession.created_at))
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
 
-    return [
-        SessionResponse(
-            id=s.id,
-            title=s.title,
-            status=s.status,
-            created_at=s.created_at,
-            completed_at=s.completed_at,
-            has_result=s.result_path is not None
-        )
-        for s in sessions
-    ]
+    return [dict(row) for row in result.mappings()]
 
 
 @router.get("/sessions/{session_id}", response_model=SessionDetailResponse)
@@ -117,31 +316,46 @@ async def get_session(
     db: AsyncSession = Depends(get_db)
 ):
     """Get a specific research session with messages"""
+    # Fetch the session and its messages in one round trip with an outer join,
+    # selecting only the columns we return instead of hydrating ORM objects
     result = await db.execute(
-        select(ResearchSession)
+        select(
+            ResearchSession.title,
+            ResearchSession.status,
+            ResearchSession.created_at.label("session_created_at"),
+            ResearchSession.completed_at,
+            ResearchSession.result_path,
+            ResearchMessage.id.label("message_id"),
+            ResearchMessage.role,
+            ResearchMessage.content,
+            ResearchMessage.created_at
+        )
+        .outerjoin(ResearchMessage, ResearchMessage.session_id == ResearchSession.id)
         .where(ResearchSession.id == session_id)
-        .options(selectinload(ResearchSession.messages))
+        .order_by(ResearchMessage.created_at)
     )
-    session = result.scalar_one_or_none()
+    rows = result.all()
 
-    if not session:
+    if not rows:
         raise HTTPException(status_code=404, detail="Session not found")
 
+    session = rows[0]
     return SessionDetailResponse(
-        id=session.id,
+        id=session_id,
         title=session.title,
         status=session.status,
-        created_at=session.created_at,
+        created_at=session.session_created_at,
         completed_at=session.completed_at,
         has_result=session.result_path is not None,
         messages=[
             MessageResponse(
-                id=m.id,
+                id=m.message_id,
                 role=m.role,
                 content=m.content,
                 created_at=m.created_at
             )
-            for m in session.messages
+            for m in rows
+            if m.message_id is not None
         ]
     )
 
@@ -153,10 +367,7 @@ async def send_message(
     db: AsyncSession = Depends(get_db)
 ):
     """Send a message in a research session"""
-    result = await db.execute(
-        select(ResearchSession).where(ResearchSession.id == session_id)
-    )
-    session = result.scalar_one_or_none()
+    session = await db.get(ResearchSession, session_id)
 
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -180,18 +391,6 @@ async def stream_research(
 ):
     """Stream deep research progress using SSE"""
 
-    result = await db.execute(
-        select(ResearchSession).where(ResearchSession.id == session_id)
-    )
-    session = result.scalar_one_or_none()
-
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    # Prevent processing if session is already completed or failed
-    if session.status in ['completed', 'failed']:
-        raise HTTPException(status_code=400, detail=f"Session already {session.status}. Cannot restart.")
-
     # Get API key
     api_result = await db.execute(
         select(AppConfig).where(AppConfig.key == "api_key")
@@ -202,88 +401,112 @@ async def stream_research(
     if not api_key:
         raise HTTPException(status_code=400, detail="API key not configured")
 
-    # Get all messages for context
-    msg_result = await db.execute(
-        select(ResearchMessage)
-        .where(ResearchMessage.session_id == session_id)
-        .order_by(ResearchMessage.created_at)
+    # Claim the session with a compare-and-swap so two subscribers can't both run it
+    claim = await db.execute(
+        update(ResearchSession)
+        .where(ResearchSession.id == session_id, ResearchSession.status == 'active')
+        .values(status='running')
+    )
+    await db.commit()
+
+    if claim.rowcount == 0:
+        session = await db.get(ResearchSession, session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        raise HTTPException(status_code=400, detail=f"Session already {session.status}. Cannot restart.")
+
+    # Only the message count (to detect the first turn) and the latest user message
+    # are needed, so don't load the whole conversation
+    message_count = await db.scalar(
+        select(func.count(ResearchMessage.id)).where(ResearchMessage.session_id == session_id)
     )
-    messages = msg_result.scalars().all()
+    user_query = await db.scalar(
+        select(ResearchMessage.content)
+        .where(ResearchMessage.session_id == session_id, ResearchMessage.role == 'user')
+        .order_by(desc(ResearchMessage.created_at))
+        .limit(1)
+    ) or ""
+
+    # The generator's cleanup only runs once it has started iterating
+    started = False
 
     async def event_generator():
+        nonlocal started
+        started = True
+        filename_task = None
+        part_path = None
+        # Set once the session has left 'running' (completed, failed, or awaiting a reply)
+        settled = False
+        # One session for every write this stream makes (clarification, result, failure)
+        write_db = AsyncSessionLocal()
         try:
-            from openai import AsyncOpenAI
-
-            client = AsyncOpenAI(api_key=api_key)
-
-            # Build conversation history
-            conversation = []
-            user_query = ""
-            for msg in messages:
-                if msg.role == 'user':
-                    user_query = msg.content
-                    conversation.append({
-                        "role": "user",
-                        "content": [{"type": "input_text", "text": msg.content}]
-                    })
-                elif msg.role == 'assistant':
-                    conversation.append({
-                        "role": "assistant",
-                        "content": [{"type": "output_text", "text": msg.content}]
-                    })
+            client = get_openai_client(api_key)
+
+            query_cache = _get_query_cache_entry(user_query)
 
             # Check if we need clarification first (only if this is the first user message)
-            if len(messages) == 1 and messages[0].role == 'user':
+            if message_count == 1 and user_query:
                 yield {
                     "event": "status",
-                    "data": json.dumps({"status": "analyzing_query", "message": "Analyzing your query..."})
+                    "data": orjson.dumps({"status": "analyzing_query", "message": "Analyzing your query..."}).decode()
                 }
 
-                # Use GPT-4 to determine if we need clarification
-                clarification_check = await client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a sticker market research specialist. Your goal is to research demographics that purchase stickers to identify potential customers and create detailed profiles for designing targeted sticker image generation prompts.\n\nThe user will provide a simple input like:\n- A type of person (e.g., 'college students', 'nurses', 'gamers')\n- A category (e.g., 'anime fans', 'dog owners', 'skaters')\n- A demographic (e.g., 'Gen Z', 'millennials', 'parents')\n- Or any simple descriptor\n\nYour job: Determine if you have enough to start comprehensive research. Almost always respond with 'CLEAR' and proceed with research. Only ask for clarification if the input is completely ambiguous or impossible to research (e.g., just 'stuff' or nonsensical text).\n\nBe permissive - interpret simple inputs generously and start research. If they say 'gamers', that's enough. If they say 'moms', that's enough. If they say 'Taylor Swift fans', that's enough."
-                        },
-                        {
-                            "role": "user",
-                            "content": user_query
-                        }
-                    ],
-                    max_tokens=200
-                )
+                # Only short or unusual queries need a model check (cached per query)
+                clarification_response = query_cache.get("clarification")
+                if clarification_response is None and not _needs_clarification_check(user_query):
+                    clarification_response = "CLEAR"
+                if clarification_response is None:
+                    clarification_check = await client.chat.completions.create(
+                        model="gpt-4o-mini",
+                        messages=[
+                            {
+                                "role": "system",
+                                "content": CLARIFICATION_SYSTEM_PROMPT
+                            },
+                            {
+                                "role": "user",
+                                "content": user_query
+                            }
+                        ],
+                        max_tokens=200,
+                        extra_body={"prompt_cache_key": "research-clarify-v1"}
+                    )
 
-                clarification_response = clarification_check.choices[0].message.content.strip()
+                    clarification_response = clarification_check.choices[0].message.content.strip()
+                    query_cache["clarification"] = clarification_response
 
                 # If not clear, ask for clarification
                 if not clarification_response.startswith("CLEAR"):
                     # Save assistant clarification message
-                    async with AsyncSessionLocal() as new_db:
-                        clarification_msg = ResearchMessage(
-                            session_id=session_id,
-                            role='assistant',
-                            content=clarification_response
-                        )
-                        new_db.add(clarification_msg)
-                        await new_db.commit()
+                    clarification_msg = ResearchMessage(
+                        session_id=session_id,
+                        role='assistant',
+                        content=clarification_response
+                    )
+                    write_db.add(clarification_msg)
+                    await write_db.execute(
+                        update(ResearchSession)
+                        .where(ResearchSession.id == session_id)
+                        .values(status='active')
+                    )
+                    await write_db.commit()
+                    settled = True
 
                     yield {
                         "event": "clarification",
-                        "data": json.dumps({"message": clarification_response})
+                        "data": orjson.dumps({"message": clarification_response}).decode()
                     }
 
                     yield {
                         "event": "done",
-                        "data": json.dumps({"status": "awaiting_response"})
+                        "data": orjson.dumps({"status": "awaiting_response"}).decode()
                     }
                     return
 
             # Proceed with deep research
             yield {
                 "event": "status",
-                "data": json.dumps({"status": "starting_research", "message": "Starting deep research..."})
+                "data": orjson.dumps({"status": "starting_research", "message": "Starting deep research..."}).decode()
             }
 
             # Build the research query from conversation with sticker-focused context
@@ -336,178 +559,159 @@ Based on the research above, provide 8-12 specific sticker design direction idea
 
 Make this research report comprehensive, specific, and immediately actionable for generating sticker design prompts."""
 
-            # Call deep research API with streaming
-            yield {
-                "event": "status",
-                "data": json.dumps({"status": "researching", "message": "Performing web searches..."})
-            }
-
-            # Use responses.create for deep research
-            response = await client.responses.create(
-                model="o3-deep-research-2025-06-26",
-                input=[
-                    {
-                        "role": "user",
-                        "content": [{"type": "input_text", "text": research_query}]
-                    }
-                ],
-                reasoning={"summary": "auto"},
-                tools=[
-                    {"type": "web_search_preview"}
-                ]
+            # Generate a descriptive filename concurrently with deep research (cached per query)
+            filename_base = query_cache.get("filename_base")
+            if filename_base is None:
+                filename_task = asyncio.create_task(_generate_filename_base(client, research_query))
+
+            # Reuse a recent report for the same audience instead of rerunning deep research
+            cache_key = _research_cache_key(user_query)
+            cached_report = await write_db.scalar(
+                select(ResearchCache.report).where(
+                    ResearchCache.key == cache_key,
+                    ResearchCache.created_at >= datetime.utcnow() - RESEARCH_CACHE_TTL
+                )
             )
 
-            # Process the response output
-            final_report = ""
-            reasoning_steps = []
-            web_searches = []
-
-            # Stream each item as we process it
-            for item in response.output:
-                item_dict = item.model_dump() if hasattr(item, 'model_dump') else {}
-
-                if hasattr(item, 'type'):
-                    # Reasoning/thinking events
-                    if item.type == "reasoning":
-                        if hasattr(item, 'summary'):
-                            for summary_item in item.summary:
-                                if hasattr(summary_item, 'text'):
-                                    reasoning_text = summary_item.text
-                                    reasoning_steps.append(reasoning_text)
-                                    yield {
-                                        "event": "thinking",
-                                        "data": json.dumps({"text": reasoning_text})
-                                    }
-                        # Also check for content in reasoning
-                        elif hasattr(item, 'content'):
-                            for content_item in item.content:
-                                if hasattr(content_item, 'text'):
-                                    reasoning_text = content_item.text
-                                    reasoning_steps.append(reasoning_text)
-                                    yield {
-                                        "event": "thinking",
-                                        "data": json.dumps({"text": reasoning_text})
-                                    }
-
-                    # Web search events
-                    elif item.type == "web_search_call":
-                        if hasattr(item, 'action'):
-                            action_dict = item.action if isinstance(item.action, dict) else {}
-                            query = action_dict.get('query', '')
-                            if query:
-                                web_searches.append(query)
-                                yield {
-                                    "event": "web_search",
-                                    "data": json.dumps({"query": query})
-                                }
-
-                    # Web search results
-                    elif item.type == "web_search_result":
-                        if hasattr(item, 'result'):
-                            result_dict = item.result if isinstance(item.result, dict) else {}
-                            url = result_dict.get('url', '')
-                            title = result_dict.get('title', '')
-                            if url:
-                                yield {
-                                    "event": "web_page",
-                                    "data": json.dumps({"url": url, "title": title or url})
-                                }
-
-                    # Final message/report
-                    elif item.type == "message":
-                        if hasattr(item, 'content'):
-                            for content_item in item.content:
-                                if hasattr(content_item, 'text'):
-                                    final_report = content_item.text
-
-            # If no final report found, try to get it from the last item
-            if not final_report and response.output:
-                last_item = response.output[-1]
-                if hasattr(last_item, 'content'):
-                    for content_item in last_item.content:
-                        if hasattr(content_item, 'text'):
-                            final_report = content_item.text
+            if cached_report is not None:
+                yield {
+                    "event": "status",
+                    "data": orjson.dumps({"status": "researching", "message": "Reusing recent research for this audience..."}).decode()
+                }
+            else:
+                # Call deep research API with streaming
+                yield {
+                    "event": "status",
+                    "data": orjson.dumps({"status": "researching", "message": "Performing web searches..."}).decode()
+                }
 
-            yield {
-                "event": "status",
-                "data": json.dumps({"status": "finalizing", "message": "Generating final report..."})
+            # Stream deep research so reasoning and searches reach the client as they happen
+            run = {
+                "report_parts": [], "written_parts": 0, "unwritten_size": 0,
+                "collected": [], "collected_saved_at": time.monotonic(),
+                "thinking": [], "thinking_since": 0.0
             }
 
-            # Generate descriptive filename using GPT-4o
-            try:
-                filename_prompt = f"""Based on this research query, create a short, descriptive filename of 1-4 words that captures the topic. Use only lowercase letters, numbers, and underscores. No file extension.
-
-Query: {research_query[:500]}
-
-Examples:
-- "climate_change_impact"
-- "ai_healthcare"
-- "quantum_computing"
-- "mars_exploration"
+            # Write the report to a temporary file as it streams in; it is renamed once
+            # the filename is known
+            part_path = os.path.join(RESEARCH_DIR_STR, f".research_{session_id}.part")
+            async with aiofiles.open(part_path, 'w', encoding='utf-8') as report_file:
+                await report_file.write(
+                    f"Research Query: {research_query}\n"
+                    f"Date: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                    + "=" * 80 + "\n\n"
+                )
 
-Filename:"""
+                if cached_report is not None:
+                    run["report_parts"].append(cached_report)
+                else:
+                    async with client.responses.stream(
+                        model="o3-deep-research-2025-06-26",
+                        input=[
+                            {
+                                "role": "user",
+                                "content": [{"type": "input_text", "text": research_query}]
+                            }
+                        ],
+                        reasoning={"summary": "auto"},
+                        tools=[
+                            {"type": "web_search_preview"}
+                        ]
+                    ) as stream:
+                        async for event in stream:
+                            handler = _STREAM_EVENT_HANDLERS.get(getattr(event, 'type', None))
+                            sse_event = handler(event, run) if handler else None
+                            # Coalesce reasoning steps; flush after the window or before any other event
+                            if run["thinking"] and (
+                                sse_event or time.monotonic() - run["thinking_since"] >= THINKING_FLUSH_SECONDS
+                            ):
+                                yield _flush_thinking(run)
+                            if sse_event:
+                                yield sse_event
+                            if run["unwritten_size"] >= REPORT_WRITE_CHUNK_CHARS:
+                                await _write_report_parts(report_file, run)
+                            # Persist steps as they arrive so they survive a failed or abandoned run
+                            if run["collected"] and (
+                                len(run["collected"]) >= STEP_FLUSH_ROWS
+                                or time.monotonic() - run["collected_saved_at"] >= STEP_FLUSH_SECONDS
+                            ):
+                                await _save_collected_steps(write_db, session_id, run)
+
+                await _write_report_parts(report_file, run)
+
+            if run["thinking"]:
+                yield _flush_thinking(run)
+
+            final_report = "".join(run["report_parts"])
 
-                filename_response = await client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "user", "content": filename_prompt}
-                    ],
-                    max_tokens=20
-                )
+            yield {
+                "event": "status",
+                "data": orjson.dumps({"status": "finalizing", "message": "Generating final report..."}).decode()
+            }
 
-                filename_base = filename_response.choices[0].message.content.strip()
-                # Clean the filename to ensure it's safe
-                import re
-                filename_base = re.sub(r'[^a-z0-9_]', '', filename_base.lower())
-                if not filename_base or len(filename_base) < 2:
+            if filename_task is not None:
+                filename_base = await filename_task
+                if filename_base:
+                    query_cache["filename_base"] = filename_base
+                else:
                     # Fallback to session ID
                     filename_base = f"research_{session_id}"
-            except:
-                # Fallback if GPT-4o fails
-                filename_base = f"research_{session_id}"
 
             filename = f"{filename_base}.txt"
-            filepath = RESEARCH_DIR / filename
+            filepath = os.path.join(RESEARCH_DIR_STR, filename)
+            if os.path.exists(filepath):
+                # Repeat queries share a cached filename; keep earlier reports intact
+                filepath = os.path.join(RESEARCH_DIR_STR, f"{filename_base}_{session_id}.txt")
 
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"Research Query: {research_query}\n")
-                f.write(f"Date: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("=" * 80 + "\n\n")
-                f.write(final_report)
+            await asyncio.to_thread(os.replace, part_path, filepath)
+            part_path = None
 
             # Update session in database
-            from ..database import AsyncSessionLocal
-            async with AsyncSessionLocal() as new_db:
-                result = await new_db.execute(
-                    select(ResearchSession).where(ResearchSession.id == session_id)
+            await write_db.execute(
+                update(ResearchSession)
+                .where(ResearchSession.id == session_id)
+                .values(status='completed', completed_at=datetime.utcnow(), result_path=filepath)
+            )
+
+            # Save any remaining reasoning/search steps (for replay) and the assistant
+            # response in the same transaction with a single bulk insert
+            message_rows = run["collected"] + [
+                {"role": "assistant", "content": final_report, "created_at": datetime.utcnow()}
+            ]
+            await write_db.execute(
+                insert(ResearchMessage),
+                [{"session_id": session_id, **row} for row in message_rows]
+            )
+
+            # Keep the report for repeat queries and drop expired entries in the same commit
+            if cached_report is None and final_report:
+                now = datetime.utcnow()
+                await write_db.execute(
+                    delete(ResearchCache).where(ResearchCache.created_at < now - RESEARCH_CACHE_TTL)
                 )
-                db_session = result.scalar_one_or_none()
-                if db_session:
-                    db_session.status = 'completed'
-                    db_session.completed_at = datetime.utcnow()
-                    db_session.result_path = str(filepath)
-                    await new_db.commit()
-
-                # Save assistant response
-                assistant_msg = ResearchMessage(
-                    session_id=session_id,
-                    role='assistant',
-                    content=final_report
+                await write_db.execute(
+                    sqlite_insert(ResearchCache)
+                    .values(key=cache_key, report=final_report, created_at=now)
+                    .on_conflict_do_update(
+                        index_elements=[ResearchCache.key],
+                        set_={"report": final_report, "created_at": now}
+                    )
                 )
-                new_db.add(assistant_msg)
-                await new_db.commit()
 
+            await write_db.commit()
+            settled = True
+
+            # The report itself is loaded with the session (or downloaded), not re-sent here
             yield {
                 "event": "result",
-                "data": json.dumps({
-                    "report": final_report,
+                "data": orjson.dumps({
                     "download_url": f"/api/research/sessions/{session_id}/download"
-                })
+                }).decode()
             }
 
             yield {
                 "event": "done",
-                "data": json.dumps({"status": "completed"})
+                "data": orjson.dumps({"status": "completed"}).decode()
             }
 
         except Exception as e:
@@ -517,23 +721,69 @@ Filename:"""
 
             # Update session status to failed
             try:
-                async with AsyncSessionLocal() as new_db:
-                    result = await new_db.execute(
-                        select(ResearchSession).where(ResearchSession.id == session_id)
-                    )
-                    db_session = result.scalar_one_or_none()
-                    if db_session:
-                        db_session.status = 'failed'
-                        await new_db.commit()
+                await write_db.rollback()
+                await write_db.execute(
+                    update(ResearchSession)
+                    .where(ResearchSession.id == session_id)
+                    .values(status='failed')
+                )
+                await write_db.commit()
+                settled = True
             except:
                 pass
 
             yield {
                 "event": "error",
-                "data": json.dumps({"error": f"{type(e).__name__}: {str(e)}"})
+                "data": orjson.dumps({"error": f"{type(e).__name__}: {str(e)}"}).decode()
             }
 
-    return EventSourceResponse(event_generator())
+        finally:
+            if filename_task is not None:
+                filename_task.cancel()
+
+            # Shielded so cleanup still runs when the client disconnects mid-stream
+            with anyio.CancelScope(shield=True):
+                if part_path is not None:
+                    try:
+                        await asyncio.to_thread(os.unlink, part_path)
+                    except FileNotFoundError:
+                        pass
+
+                # Stream ended early: release the claim so the session can be resumed
+                if not settled:
+                    try:
+                        await write_db.rollback()
+                        await write_db.execute(
+                            update(ResearchSession)
+                            .where(ResearchSession.id == session_id, ResearchSession.status == 'running')
+                            .values(status='active')
+                        )
+                        await write_db.commit()
+                    except:
+                        pass
+
+                await write_db.close()
+
+    async def release_unstarted_claim():
+        """Release the claim if the response ended before the stream began"""
+        if started:
+            return
+        async with AsyncSessionLocal() as release_db:
+            await release_db.execute(
+                update(ResearchSession)
+                .where(ResearchSession.id == session_id, ResearchSession.status == 'running')
+                .values(status='active')
+            )
+            await release_db.commit()
+
+    # Ping keeps idle proxies from dropping long deep-research runs; send_timeout
+    # ends the stream if a stalled client stops reading
+    return EventSourceResponse(
+        event_generator(),
+        ping=SSE_PING_SECONDS,
+        send_timeout=SSE_SEND_TIMEOUT_SECONDS,
+        background=BackgroundTask(release_unstarted_claim),
+    )
 
 
 @router.get("/sessions/{session_id}/download")
@@ -544,10 +794,7 @@ async def download_research(
     """Download research result as .txt file"""
     from fastapi.responses import FileResponse
 
-    result = await db.execute(
-        select(ResearchSession).where(ResearchSession.id == session_id)
-    )
-    session = result.scalar_one_or_none()
+    session = await db.get(ResearchSession, session_id)
 
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -555,14 +802,18 @@ async def download_research(
     if not session.result_path:
         raise HTTPException(status_code=404, detail="Research result not available")
 
-    filepath = Path(session.result_path)
-    if not filepath.exists():
+    filepath = session.result_path
+    # Stat once off the event loop and hand it to FileResponse so it doesn't stat again
+    try:
+        stat_result = await asyncio.to_thread(os.stat, filepath)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found on disk")
 
     return FileResponse(
         path=filepath,
-        filename=filepath.name,
-        media_type='text/plain'
+        filename=os.path.basename(filepath),
+        media_type='text/plain',
+        stat_result=stat_result
     )
 
 
@@ -572,19 +823,17 @@ async def delete_session(
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a research session"""
-    result = await db.execute(
-        select(ResearchSession).where(ResearchSession.id == session_id)
-    )
-    session = result.scalar_one_or_none()
+    session = await db.get(ResearchSession, session_id)
 
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
     # Delete result file if exists
     if session.result_path:
-        filepath = Path(session.result_path)
-        if filepath.exists():
-            filepath.unlink()
+        try:
+            await asyncio.to_thread(os.unlink, session.result_path)
+        except FileNotFoundError:
+            pass
 
     # Delete from database (cascade will handle messages)
     await db.delete(session)
@@ -603,10 +852,11 @@ async def delete_all_sessions(db: AsyncSession = Depends(get_db)):
     for session in sessions:
         # Delete result file if exists
         if session.result_path:
-            filepath = Path(session.result_path)
-            if filepath.exists():
-                filepath.unlink()
+            try:
+                await asyncio.to_thread(os.unlink, session.result_path)
                 deleted_count += 1
+            except FileNotFoundError:
+                pass
 
         # Delete from database (cascade will handle messages)
         await db.delete(session)
@@ -1,17 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pathlib import Path
+from typing import Optional, Tuple, AsyncIterator
+import os
+import asyncio
+import aiofiles
 
 from ..database import get_db, Job
 from ..services.zip_generator import ZipGeneratorService
+from ..services.config_cache import get_cached_configs
 
 router = APIRouter(prefix="/api", tags=["zips"])
 
+ALL_JOBS_ZIP_KEYS = ["all_jobs_zip_path", "all_jobs_zip_sha256", "all_jobs_zip_size_bytes"]
+
+# Clients may keep ZIPs but must revalidate them against the ETag; proxies must not re-encode them
+ZIP_CACHE_CONTROL = "private, max-age=0, must-revalidate, no-transform"
+
+# Read size when serving a byte range of a ZIP
+RANGE_CHUNK_SIZE = 1024 * 1024
+
+
+def _zip_headers(sha256: Optional[str]) -> dict:
+    """Caching headers for a ZIP; the ETag is the quoted SHA-256"""
+    headers = {"Cache-Control": ZIP_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if sha256:
+        headers["ETag"] = f'"{sha256}"'
+    return headers
+
+
+def _not_modified(request: Request, headers: dict) -> Optional[Response]:
+    """304 response if the client's If-None-Match matches the ETag in headers"""
+    etag = headers.get("ETag")
+    if_none_match = request.headers.get("if-none-match")
+    if not etag or not if_none_match:
+        return None
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single 'bytes=' range into inclusive (start, end); None means serve the whole file"""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_str, _, end_str = spec.strip().partition("-")
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(end_str))
+            end = size - 1
+    except ValueError:
+        return None
+    # Unsatisfiable ranges get a 416 from the caller
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+async def _iter_file_range(path: Path, start: int, end: int) -> AsyncIterator[bytes]:
+    """Yield bytes start..end (inclusive) of a file"""
+    remaining = end - start + 1
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        while remaining > 0:
+            chunk = await f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def _zip_file_response(request: Request, path: Path, filename: str, headers: dict) -> Response:
+    """Serve a ZIP from disk, honoring a single byte Range (this Starlette's FileResponse can't)"""
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == headers.get("ETag")):
+        size = (await asyncio.to_thread(os.stat, path)).st_size
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            return StreamingResponse(
+                _iter_file_range(path, start, end),
+                status_code=206,
+                media_type="application/zip",
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(end - start + 1),
+                    "Content-Disposition": f'attachment; filename="{filename}"'
+                }
+            )
+
+    return FileResponse(
+        path=path,
+        media_type="application/zip",
+        filename=filename,
+        headers=headers
+    )
+
+
+async def _job_zip_response(request: Request, db: AsyncSession, job: Job, filename: str) -> Response:
+    """Serve a succeeded job's cached ZIP, or stream one if it isn't on disk"""
+    # If ZIP doesn't exist, stream it straight to the client instead of building it first
+    if not job.zip_path or not Path(job.zip_path).exists():
+        zip_service = ZipGeneratorService(db)
+        zip_stream = await zip_service.stream_job_zip(job.id)
+
+        if not zip_stream:
+            raise HTTPException(status_code=500, detail="Failed to build ZIP")
+
+        return StreamingResponse(
+            zip_stream,
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    headers = _zip_headers(job.zip_sha256)
+    not_modified = _not_modified(request, headers)
+    if not_modified:
+        return not_modified
+
+    return await _zip_file_response(request, Path(job.zip_path), filename, headers)
+
+
+async def _get_all_jobs_zip_config(db: AsyncSession) -> dict:
+    """Fetch the all-jobs ZIP path, SHA-256 and size from config (cached briefly in memory)"""
+    return await get_cached_configs(db, ALL_JOBS_ZIP_KEYS)
+
 
 @router.get("/jobs/{job_id}/zip")
-async def download_job_zip(job_id: int, db: AsyncSession = Depends(get_db)):
+async def download_job_zip(job_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """Download ZIP file for a specific job"""
     result = await db.execute(
         select(Job).where(Job.id == job_id)
@@ -24,25 +153,7 @@ async def download_job_zip(job_id: int, db: AsyncSession = Depends(get_db)):
     if job.status != "succeeded":
         raise HTTPException(status_code=400, detail="Job not completed")
 
-    # If ZIP doesn't exist, build it
-    if not job.zip_path or not Path(job.zip_path).exists():
-        zip_service = ZipGeneratorService(db)
-        zip_path = await zip_service.build_job_zip(job_id)
-
-        if not zip_path:
-            raise HTTPException(status_code=500, detail="Failed to build ZIP")
-    else:
-        zip_path = Path(job.zip_path)
-
-    return FileResponse(
-        path=zip_path,
-        media_type="application/zip",
-        filename=f"job_{job_id}.zip",
-        headers={
-            "ETag": job.zip_sha256 if job.zip_sha256 else "",
-            "Content-Length": str(job.zip_size_bytes) if job.zip_size_bytes else ""
-        }
-    )
+    return await _job_zip_response(request, db, job, f"job_{job_id}.zip")
 
 
 @router.head("/jobs/{job_id}/zip")
@@ -56,16 +167,14 @@ async def head_job_zip(job_id: int, db: AsyncSession = Depends(get_db)):
     if not job or not job.zip_path:
         raise HTTPException(status_code=404, detail="ZIP not found")
 
-    return Response(
-        headers={
-            "Content-Length": str(job.zip_size_bytes) if job.zip_size_bytes else "",
-            "ETag": job.zip_sha256 if job.zip_sha256 else ""
-        }
-    )
+    headers = _zip_headers(job.zip_sha256)
+    headers["Content-Length"] = str(job.zip_size_bytes) if job.zip_size_bytes else ""
+
+    return Response(headers=headers)
 
 
 @router.get("/zips/latest")
-async def download_latest_zip(db: AsyncSession = Depends(get_db)):
+async def download_latest_zip(request: Request, db: AsyncSession = Depends(get_db)):
     """Download ZIP for the most recent completed job"""
     result = await db.execute(
         select(Job)
@@ -78,56 +187,26 @@ async def download_latest_zip(db: AsyncSession = Depends(get_db)):
     if not job:
         raise HTTPException(status_code=404, detail="No completed jobs found")
 
-    # If ZIP doesn't exist, build it
-    if not job.zip_path or not Path(job.zip_path).exists():
-        zip_service = ZipGeneratorService(db)
-        zip_path = await zip_service.build_job_zip(job.id)
-
-        if not zip_path:
-            raise HTTPException(status_code=500, detail="Failed to build ZIP")
-    else:
-        zip_path = Path(job.zip_path)
-
-    return FileResponse(
-        path=zip_path,
-        media_type="application/zip",
-        filename=f"latest_job_{job.id}.zip",
-        headers={
-            "ETag": job.zip_sha256 if job.zip_sha256 else ""
-        }
-    )
+    return await _job_zip_response(request, db, job, f"latest_job_{job.id}.zip")
 
 
 @router.get("/zips/all")
-async def download_all_zip(db: AsyncSession = Depends(get_db)):
+async def download_all_zip(request: Request, db: AsyncSession = Depends(get_db)):
     """Download combined ZIP of all images across all jobs"""
     zip_service = ZipGeneratorService(db)
 
     # Check if cached version exists
-    from ..database import AppConfig
+    config = await _get_all_jobs_zip_config(db)
 
-    result = await db.execute(
-        select(AppConfig).where(AppConfig.key == "all_jobs_zip_path")
-    )
-    config = result.scalar_one_or_none()
-
-    if config and config.value:
-        zip_path = Path(config.value)
+    if config.get("all_jobs_zip_path"):
+        zip_path = Path(config["all_jobs_zip_path"])
         if zip_path.exists():
-            # Get SHA-256 from config
-            result = await db.execute(
-                select(AppConfig).where(AppConfig.key == "all_jobs_zip_sha256")
-            )
-            sha_config = result.scalar_one_or_none()
+            headers = _zip_headers(config.get("all_jobs_zip_sha256"))
+            not_modified = _not_modified(request, headers)
+            if not_modified:
+                return not_modified
 
-            return FileResponse(
-                path=zip_path,
-                media_type="application/zip",
-                filename="all_jobs.zip",
-                headers={
-                    "ETag": sha_config.value if sha_config else ""
-                }
-            )
+            return await _zip_file_response(request, zip_path, "all_jobs.zip", headers)
 
     # Build new all-jobs ZIP
     zip_path = await zip_service.build_all_jobs_zip()
@@ -136,47 +215,27 @@ async def download_all_zip(db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="No images found")
 
     # Get SHA-256 from config
-    result = await db.execute(
-        select(AppConfig).where(AppConfig.key == "all_jobs_zip_sha256")
-    )
-    sha_config = result.scalar_one_or_none()
+    config = await _get_all_jobs_zip_config(db)
 
-    return FileResponse(
-        path=zip_path,
-        media_type="application/zip",
-        filename="all_jobs.zip",
-        headers={
-            "ETag": sha_config.value if sha_config else ""
-        }
+    return await _zip_file_response(
+        request, zip_path, "all_jobs.zip", _zip_headers(config.get("all_jobs_zip_sha256"))
     )
 
 
 @router.head("/zips/all")
 async def head_all_zip(db: AsyncSession = Depends(get_db)):
     """Get headers for all-jobs ZIP file"""
-    from ..database import AppConfig
-
-    result = await db.execute(
-        select(AppConfig).where(AppConfig.key == "all_jobs_zip_path")
-    )
-    config = result.scalar_one_or_none()
+    config = await _get_all_jobs_zip_config(db)
 
-    if not config or not config.value:
+    if not config.get("all_jobs_zip_path"):
         raise HTTPException(status_code=404, detail="ZIP not built yet")
 
-    zip_path = Path(config.value)
+    zip_path = Path(config["all_jobs_zip_path"])
     if not zip_path.exists():
         raise HTTPException(status_code=404, detail="ZIP not found")
 
-    # Get SHA-256
-    result = await db.execute(
-        select(AppConfig).where(AppConfig.key == "all_jobs_zip_sha256")
-    )
-    sha_config = result.scalar_one_or_none()
+    headers = _zip_headers(config.get("all_jobs_zip_sha256"))
+    # Size is stored with the build; only stat archives built before it was recorded
+    headers["Content-Length"] = config.get("all_jobs_zip_size_bytes") or str(zip_path.stat().st_size)
 
-    return Response(
-        headers={
-            "Content-Length": str(zip_path.stat().st_size),
-            "ETag": sha_config.value if sha_config else ""
-        }
-    )
+    return Response(headers=headers)
@@ -0,0 +1,62 @@
+import time
+import asyncio
+from collections import OrderedDict
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Optional
+
+from ..database import AppConfig
+
+# Config values read on hot download paths are served from memory for a short window
+CONFIG_CACHE_TTL_SECONDS = 30.0
+CONFIG_CACHE_SIZE = 32
+
+# key -> (expires_at, value); a None value caches a missing key
+_cache: "OrderedDict[str, tuple[float, Optional[str]]]" = OrderedDict()
+_lock = asyncio.Lock()
+# Bumped by invalidate_config so a query racing an update doesn't cache the old value
+_generation = 0
+
+
+async def get_cached_configs(db: AsyncSession, keys: list[str]) -> dict:
+    """Get config values for keys, querying only those not cached (missing keys are omitted)"""
+    async with _lock:
+        now = time.monotonic()
+        values = {}
+        stale = []
+        for key in keys:
+            entry = _cache.get(key)
+            if entry is not None and entry[0] > now:
+                values[key] = entry[1]
+                _cache.move_to_end(key)
+            else:
+                stale.append(key)
+
+        if stale:
+            generation = _generation
+            result = await db.execute(
+                select(AppConfig.key, AppConfig.value).where(AppConfig.key.in_(stale))
+            )
+            fetched = dict(result.all())
+            # An invalidation during the query means these values may already be stale
+            store = generation == _generation
+            expires_at = now + CONFIG_CACHE_TTL_SECONDS
+            for key in stale:
+                values[key] = fetched.get(key)
+                if store:
+                    _cache[key] = (expires_at, values[key])
+                    _cache.move_to_end(key)
+            while len(_cache) > CONFIG_CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    return {key: value for key, value in values.items() if value is not None}
+
+
+def invalidate_config(*keys: str):
+    """Drop cached values for keys (all keys if none given) after they change"""
+    global _generation
+    _generation += 1
+    if not keys:
+        _cache.clear()
+    for key in keys:
+        _cache.pop(key, None)
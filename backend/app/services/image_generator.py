@@ -6,12 +6,44 @@ import hashlib
 import asyncio
 from pathlib import Path
 from datetime import datetime
-from openai import AsyncOpenAI, RateLimitError, APIError
+from openai import RateLimitError, APIError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from typing import Optional
 
 from ..database import Job, Image, AppConfig
+from .openai_client import get_openai_client
+
+# Ensure images directory exists
+IMAGES_DIR = Path(__file__).parent.parent.parent.parent / "data" / "images"
+IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+
+# Default number of image requests in flight per job (config key image_concurrency)
+IMAGE_CONCURRENCY = 4
+
+# Image rows are committed in batches of this size, or sooner once this much time has passed
+IMAGE_COMMIT_BATCH = 10
+IMAGE_COMMIT_SECONDS = 10.0
+
+
+class _SlugTable(dict):
+    """Maps each codepoint to its filename-safe form the first time it is looked up"""
+
+    def __missing__(self, codepoint: int) -> str:
+        # lower() can yield several characters (e.g. U+0130), so check each of them
+        slug = ''.join(
+            c if c.isalnum() or c.isspace() else '-' for c in chr(codepoint).lower()
+        )
+        self[codepoint] = slug
+        return slug
+
+
+_SLUG_TABLE = _SlugTable()
+
+
+def _slugify(text: str, max_length: int = 50) -> str:
+    """Lowercased, dash-joined form of text for use in image filenames"""
+    return '-'.join(text.translate(_SLUG_TABLE).split())[:max_length]
 
 
 class ImageGeneratorService:
@@ -21,6 +53,12 @@ class ImageGeneratorService:
         self.delay = 5.0
         self.max_delay = 120.0
         self.success_streak = 0
+        self.pending_images = []
+        self.pending_since = 0.0
+        # Shared by all in-flight prompts: no new requests start before this (monotonic) time
+        self.resume_at = 0.0
+        # The session can't run statements concurrently, so batch commits are serialized
+        self.commit_lock = asyncio.Lock()
 
     def jitter(self, s: float) -> float:
         """Add +/-10% jitter to delay"""
@@ -56,37 +94,50 @@ class ImageGeneratorService:
             "finished_at": finished_at.isoformat() if finished_at else None
         })
 
-    async def generate_images(self, prompts: list[str], base_prompt: str, api_key: str):
-        """Generate images for all prompts"""
-        if not api_key:
-            await self.update_job_status("failed")
-            raise ValueError("API key is required")
-
-        # Update status to running
-        await self.update_job_status("running")
-
-        # Initialize OpenAI client
-        client = AsyncOpenAI(api_key=api_key)
-
-        # Create output directory for this job
-        output_dir = Path(__file__).parent.parent.parent.parent / "data" / "images" / str(self.job_id)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        # Process each prompt
-        for i, prompt in enumerate(prompts, 1):
-            # Proactive throttling with jitter
-            if i > 1:
-                sleep_time = self.jitter(self.delay)
-                await asyncio.sleep(sleep_time)
-
-            retry_count = 0
-            max_retries = 3
-
-            while retry_count < max_retries:
-                try:
-                    # Enhanced prompt with base sticker styling
-                    enhanced_prompt = f"{prompt} — {base_prompt}"
-
+    async def commit_pending_images(self):
+        """Insert buffered image rows in one commit, then announce them"""
+        async with self.commit_lock:
+            # Take the batch first; other prompts may buffer rows while this commits
+            batch, self.pending_images = self.pending_images, []
+            if not batch:
+                return
+            self.db.add_all(record for record, _ in batch)
+            await self.db.commit()
+
+        # Emit only after commit so clients reloading on the event see the rows
+        for record, event_data in batch:
+            await self.emit_event("image_created", {"image_id": record.id, **event_data})
+
+    async def generate_one(
+        self,
+        semaphore: asyncio.Semaphore,
+        client,
+        output_dir: Path,
+        i: int,
+        total: int,
+        prompt: str,
+        base_prompt: str
+    ):
+        """Generate, save and record the image for one prompt (with retries)"""
+        retry_count = 0
+        max_retries = 3
+
+        while retry_count < max_retries:
+            # Honor a rate-limit backoff started by any prompt, without holding a slot
+            wait_time = self.resume_at - time.monotonic()
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+                continue
+
+            try:
+                # Enhanced prompt with base sticker styling
+                enhanced_prompt = f"{prompt} — {base_prompt}"
+
+                # Only the request itself holds a slot; backoff sleeps happen outside it
+                async with semaphore:
+                    # A backoff may have started while this prompt waited for the slot
+                    if self.resume_at > time.monotonic():
+                        continue
                     response = await client.images.generate(
                         model='gpt-image-1',
                         prompt=enhanced_prompt,
@@ -95,76 +146,122 @@ class ImageGeneratorService:
                         output_compression=100
                     )
 
-                    # Decode base64 image
-                    image_base64 = response.data[0].b64_json
-                    image_bytes = base64.b64decode(image_base64)
-
-                    # Create filename from prompt (sanitized)
-                    sanitized = ''.join(c if c.isalnum() or c.isspace() else '-' for c in prompt.lower())
-                    sanitized = '-'.join(sanitized.split())[:50]
-                    filename = f'{str(i).zfill(3)}-{sanitized}.png'
-                    filepath = output_dir / filename
-
-                    # Save image
-                    with open(filepath, 'wb') as f:
-                        f.write(image_bytes)
-
-                    # Save to database
-                    image_record = Image(
-                        job_id=self.job_id,
-                        path=str(filepath),
-                        prompt_text=prompt,
-                        width=1024,
-                        height=1024,
-                        created_at=datetime.utcnow()
-                    )
-                    self.db.add(image_record)
-                    await self.db.commit()
-                    await self.db.refresh(image_record)
-
-                    # Emit event
-                    await self.emit_event("image_created", {
-                        "image_id": image_record.id,
-                        "job_id": self.job_id,
-                        "filename": filename,
-                        "progress": f"{i}/{len(prompts)}"
-                    })
-
-                    # Successful request - cautiously speed up after consecutive successes
-                    self.success_streak += 1
-                    if self.success_streak >= 5 and self.delay > 2.0:
-                        self.delay = max(2.0, self.delay * 0.9)
-                        self.success_streak = 0
-
-                    break  # Success, move to next prompt
-
-                except RateLimitError as e:
+                # Decode base64 image
+                image_base64 = response.data[0].b64_json
+                image_bytes = base64.b64decode(image_base64)
+
+                # Create filename from prompt (sanitized)
+                sanitized = _slugify(prompt)
+                filename = f'{str(i).zfill(3)}-{sanitized}.png'
+                filepath = output_dir / filename
+
+                # Save image
+                with open(filepath, 'wb') as f:
+                    f.write(image_bytes)
+
+                # Buffer the database row; rows are added and committed in batches so
+                # the SQLite write lock isn't held across the throttling sleeps
+                image_record = Image(
+                    job_id=self.job_id,
+                    path=str(filepath),
+                    prompt_text=prompt,
+                    width=1024,
+                    height=1024,
+                    created_at=datetime.utcnow()
+                )
+                if not self.pending_images:
+                    self.pending_since = time.monotonic()
+                self.pending_images.append((image_record, {
+                    "job_id": self.job_id,
+                    "filename": filename,
+                    "progress": f"{i}/{total}"
+                }))
+                if (
+                    len(self.pending_images) >= IMAGE_COMMIT_BATCH
+                    or time.monotonic() - self.pending_since >= IMAGE_COMMIT_SECONDS
+                ):
+                    await self.commit_pending_images()
+
+                # Successful request - cautiously speed up after consecutive successes
+                self.success_streak += 1
+                if self.success_streak >= 5 and self.delay > 2.0:
+                    self.delay = max(2.0, self.delay * 0.9)
                     self.success_streak = 0
-                    retry_after = None
 
-                    if hasattr(e, 'response') and e.response is not None:
-                        retry_after = e.response.headers.get('retry-after')
+                break  # Success, move to next prompt
 
-                    if retry_after:
-                        wait_time = self.jitter(float(retry_after))
-                    else:
-                        self.delay = min(self.max_delay, self.delay * 2.0)
-                        wait_time = self.jitter(self.delay)
+            except RateLimitError as e:
+                self.success_streak = 0
+                retry_after = None
 
-                    await asyncio.sleep(wait_time)
-                    retry_count += 1
+                if hasattr(e, 'response') and e.response is not None:
+                    retry_after = e.response.headers.get('retry-after')
 
-                except APIError as e:
-                    wait_time = self.jitter(min(self.max_delay, self.delay * 1.5))
-                    await asyncio.sleep(wait_time)
-                    retry_count += 1
+                if retry_after:
+                    wait_time = self.jitter(float(retry_after))
+                else:
+                    self.delay = min(self.max_delay, self.delay * 2.0)
+                    wait_time = self.jitter(self.delay)
 
-                except Exception as e:
-                    print(f"Failed to generate image for prompt '{prompt}': {str(e)}")
-                    retry_count += 1
+                # Back off every in-flight prompt, not just this one
+                self.resume_at = max(self.resume_at, time.monotonic() + wait_time)
+                retry_count += 1
 
-            if retry_count >= max_retries:
-                print(f"Skipping prompt after {max_retries} retries: {prompt}")
+            except APIError as e:
+                wait_time = self.jitter(min(self.max_delay, self.delay * 1.5))
+                await asyncio.sleep(wait_time)
+                retry_count += 1
+
+            except Exception as e:
+                print(f"Failed to generate image for prompt '{prompt}': {str(e)}")
+                retry_count += 1
+
+        if retry_count >= max_retries:
+            print(f"Skipping prompt after {max_retries} retries: {prompt}")
+
+    async def generate_images(self, prompts: list[str], base_prompt: str, api_key: str):
+        """Generate images for all prompts"""
+        if not api_key:
+            await self.update_job_status("failed")
+            raise ValueError("API key is required")
+
+        # Update status to running
+        await self.update_job_status("running")
+
+        # Initialize OpenAI client
+        client = get_openai_client(api_key)
+
+        # Create output directory for this job
+        output_dir = IMAGES_DIR / str(self.job_id)
+        output_dir.mkdir(exist_ok=True)
+
+        # Generate several images at once; the semaphore bounds in-flight requests
+        try:
+            concurrency = int(await self.get_config("image_concurrency") or IMAGE_CONCURRENCY)
+        except (TypeError, ValueError):
+            concurrency = IMAGE_CONCURRENCY
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        tasks = [
+            asyncio.create_task(self.generate_one(
+                semaphore, client, output_dir, i, len(prompts), prompt, base_prompt
+            ))
+            for i, prompt in enumerate(prompts, 1)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            # Record the buffered rows before the caller's failure path rolls back;
+            # their PNGs are already on disk
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self.commit_pending_images()
+            except Exception as e:
+                print(f"Failed to record buffered images for job {self.job_id}: {str(e)}")
+            raise
+
+        await self.commit_pending_images()
 
         # Mark job as succeeded
         await self.update_job_status("succeeded", datetime.utcnow())
@@ -0,0 +1,22 @@
+import hashlib
+from openai import AsyncOpenAI
+
+# Shared clients keyed by API key hash so requests reuse one HTTP connection pool
+_clients: dict[str, AsyncOpenAI] = {}
+
+
+def get_openai_client(api_key: str) -> AsyncOpenAI:
+    """Get the shared AsyncOpenAI client for an API key"""
+    key = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+    client = _clients.get(key)
+    if client is None:
+        client = _clients[key] = AsyncOpenAI(api_key=api_key)
+    return client
+
+
+async def close_openai_clients():
+    """Close all shared clients (called on app shutdown)"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.close()
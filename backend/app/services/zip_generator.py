@@ -1,12 +1,257 @@
+import io
+import os
+import time
+import shutil
+import contextlib
 import zipfile
 import hashlib
+import asyncio
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
-from typing import Optional
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Optional, List, Tuple, AsyncIterator, Callable, Awaitable
 
-from ..database import Job, Image
+from ..database import Job, Image, AsyncSessionLocal
+from .config_cache import invalidate_config
+
+# Ensure ZIP directory exists
+ZIPS_DIR = Path(__file__).parent.parent.parent.parent / "data" / "zips"
+ZIPS_DIR.mkdir(parents=True, exist_ok=True)
+ALL_JOBS_ZIP_PATH = ZIPS_DIR / "all_jobs.zip"
+
+# AppConfig keys holding the all-jobs ZIP metadata
+ALL_JOBS_ZIP_CONFIG_KEYS = [
+    "all_jobs_zip_path",
+    "all_jobs_zip_sha256",
+    "all_jobs_zip_size_bytes",
+    "all_jobs_zip_built_at"
+]
+
+
+# PNGs are already DEFLATE-compressed, so archive them as-is instead of recompressing
+ZIP_COMPRESSION = zipfile.ZIP_STORED
+
+# Streamed archives are handed to the response in chunks of this size, with at
+# most STREAM_QUEUE_CHUNKS buffered ahead of a slow client
+STREAM_CHUNK_SIZE = 256 * 1024
+STREAM_QUEUE_CHUNKS = 8
+
+# Read size when hashing files without hashlib.file_digest
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Read size when copying images into archives
+COPY_BLOCK_SIZE = 1024 * 1024
+
+# Reader threads prefetch up to ZIP_PREFETCH_FILES images ahead of the ZIP writer;
+# files larger than ZIP_PREFETCH_MAX_BYTES are copied in blocks instead
+ZIP_READ_WORKERS = 4
+ZIP_PREFETCH_FILES = 8
+ZIP_PREFETCH_MAX_BYTES = 16 * 1024 * 1024
+
+
+# Builds and invalidations replace the same archive files, so they run one at a time
+_build_lock = asyncio.Lock()
+
+# Suffix source for part files, unique within this process
+_part_ids = itertools.count()
+
+
+def _part_path(path: Path) -> Path:
+    """Unique temporary path beside path; finished archives are os.replace'd over path"""
+    return path.with_name(f".{path.name}.{os.getpid()}.{next(_part_ids)}.part")
+
+
+def _sha256_file_sync(filepath: Path) -> str:
+    """Compute SHA-256 hash of a file (blocking)"""
+    with open(filepath, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+: C-level read loop into a reused buffer
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        sha256_hash = hashlib.sha256()
+        for byte_block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            sha256_hash.update(byte_block)
+    return sha256_hash.hexdigest()
+
+
+async def _stat_members(members: List[Tuple[Path, str]]) -> List[Tuple[Path, str, os.stat_result]]:
+    """Stat all member files concurrently, dropping ones missing on disk"""
+    async def stat_or_none(src_path: Path) -> Optional[os.stat_result]:
+        try:
+            return await asyncio.to_thread(os.stat, src_path)
+        except FileNotFoundError:
+            return None
+
+    stats = await asyncio.gather(*(stat_or_none(src_path) for src_path, _ in members))
+    return [
+        (src_path, arcname, st)
+        for (src_path, arcname), st in zip(members, stats)
+        if st is not None
+    ]
+
+
+def _read_member(src_path: Path, st: os.stat_result) -> Optional[bytes]:
+    """Read a member file for prefetching (None if it's too large to hold in memory)"""
+    if st.st_size > ZIP_PREFETCH_MAX_BYTES:
+        return None
+    with open(src_path, "rb") as f:
+        return f.read()
+
+
+def _add_members(archives: List[zipfile.ZipFile], members: List[Tuple[Path, str, os.stat_result]]):
+    """Copy stat'ed members into open ZIPs without zipfile re-stating each file (blocking)"""
+    with ThreadPoolExecutor(max_workers=ZIP_READ_WORKERS) as pool:
+        # Reads overlap with writing; entries are still written in member order
+        remaining = iter(members)
+        prefetched = deque()
+        for member in remaining:
+            prefetched.append((member, pool.submit(_read_member, member[0], member[2])))
+            if len(prefetched) >= ZIP_PREFETCH_FILES:
+                break
+
+        while prefetched:
+            (src_path, arcname, st), future = prefetched.popleft()
+            next_member = next(remaining, None)
+            if next_member is not None:
+                prefetched.append((next_member, pool.submit(_read_member, next_member[0], next_member[2])))
+
+            try:
+                data = future.result()
+            except FileNotFoundError:
+                # Deleted since it was stat'ed
+                continue
+
+            date_time = max(time.localtime(st.st_mtime)[:6], (1980, 1, 1, 0, 0, 0))
+            for zipf in archives:
+                # zipfile records offsets and CRCs on the ZipInfo, so each archive gets its own
+                zinfo = zipfile.ZipInfo(arcname, date_time=date_time)
+                zinfo.compress_type = ZIP_COMPRESSION
+                zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+                if data is not None:
+                    zipf.writestr(zinfo, data)
+                else:
+                    zinfo.file_size = st.st_size
+                    with open(src_path, "rb") as src, zipf.open(zinfo, "w") as dest:
+                        shutil.copyfileobj(src, dest, COPY_BLOCK_SIZE)
+
+
+def _write_zip_sync(zip_path: Path, members: List[Tuple[Path, str, os.stat_result]]) -> Tuple[str, int]:
+    """Write (source path, arcname, stat) members to a ZIP and return its SHA-256 and size (blocking)"""
+    # Built under a part name so readers never see a half-written archive
+    part_path = _part_path(zip_path)
+    try:
+        # A seekable file lets zipfile put each entry's CRC and sizes in its local
+        # header; streaming readers reject stored entries that use data descriptors
+        with zipfile.ZipFile(part_path, 'w', ZIP_COMPRESSION) as zipf:
+            _add_members([zipf], members)
+        sha256 = _sha256_file_sync(part_path)
+        size_bytes = part_path.stat().st_size
+        os.replace(part_path, zip_path)
+    finally:
+        part_path.unlink(missing_ok=True)
+
+    return sha256, size_bytes
+
+
+class _QueueWriter(io.RawIOBase):
+    """Non-seekable file object that passes ZIP bytes from a worker thread to an asyncio.Queue"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+        self.buffer = bytearray()
+        self.position = 0
+        self.aborted = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.aborted:
+            raise OSError("ZIP stream consumer went away")
+        self.buffer += data
+        self.position += len(data)
+        if len(self.buffer) >= STREAM_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        if self.buffer and not self.aborted:
+            chunk = bytes(self.buffer)
+            self.buffer.clear()
+            self._put(chunk)
+
+    def finish(self):
+        """Send any buffered bytes followed by the end-of-stream marker"""
+        self.flush()
+        if not self.aborted:
+            self._put(None)
+
+    def _put(self, item):
+        # Blocks the worker thread while the queue is full (backpressure)
+        asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result()
+
+
+async def _stream_zip(
+    members: List[Tuple[Path, str]],
+    save_path: Optional[Path] = None,
+    on_saved: Optional[Callable[[Path, str, int], Awaitable[None]]] = None
+) -> AsyncIterator[bytes]:
+    """Build a ZIP in a worker thread and yield its bytes as they are written"""
+    # With save_path each member is also written to a seekable archive in a part file;
+    # once the whole stream has been sent it is moved into place and
+    # on_saved(path, sha256, size) is awaited
+    members = await _stat_members(members)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+    writer = _QueueWriter(loop, queue)
+    part_path = _part_path(save_path) if save_path else None
+
+    def produce() -> bool:
+        try:
+            with contextlib.ExitStack() as stack:
+                # The writer can't seek, so zipfile emits data descriptors after each
+                # member and the central directory at the end
+                archives = [stack.enter_context(zipfile.ZipFile(writer, 'w', ZIP_COMPRESSION))]
+                if part_path:
+                    archives.append(stack.enter_context(zipfile.ZipFile(part_path, 'w', ZIP_COMPRESSION)))
+                _add_members(archives, members)
+            return True
+        except OSError:
+            # Expected when the client disconnects mid-download
+            if not writer.aborted:
+                raise
+            return False
+        finally:
+            writer.finish()
+
+    producer = asyncio.ensure_future(asyncio.to_thread(produce))
+    try:
+        while (chunk := await queue.get()) is not None:
+            yield chunk
+        completed = await producer
+        if completed and save_path:
+            sha256 = await asyncio.to_thread(_sha256_file_sync, part_path)
+            size_bytes = part_path.stat().st_size
+            # Replace and record together so a concurrent build can't interleave
+            async with _build_lock:
+                os.replace(part_path, save_path)
+                if on_saved:
+                    await on_saved(save_path, sha256, size_bytes)
+    finally:
+        # Client disconnected or build failed: unblock and stop the worker
+        writer.aborted = True
+        while not queue.empty():
+            queue.get_nowait()
+        if part_path:
+            part_path.unlink(missing_ok=True)
 
 
 class ZipGeneratorService:
@@ -15,11 +260,40 @@ class ZipGeneratorService:
 
     async def compute_sha256(self, filepath: Path) -> str:
         """Compute SHA-256 hash of a file"""
-        sha256_hash = hashlib.sha256()
-        with open(filepath, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+        return await asyncio.to_thread(_sha256_file_sync, filepath)
+
+    async def _job_zip_members(self, job_id: int) -> List[Tuple[Path, str]]:
+        """(source path, arcname) pairs for a job's images"""
+        # Only the path is needed, so skip building ORM objects
+        result = await self.db.execute(
+            select(Image.path).where(Image.job_id == job_id)
+        )
+        members = []
+        for path_str in result.scalars():
+            image_path = Path(path_str)
+            members.append((image_path, image_path.name))
+        return members
+
+    async def stream_job_zip(self, job_id: int) -> Optional[AsyncIterator[bytes]]:
+        """Stream a job's ZIP, keeping a copy for later downloads (None if the job has no images)"""
+        members = await self._job_zip_members(job_id)
+        if not members:
+            return None
+
+        async def record_zip(zip_path: Path, sha256: str, size_bytes: int):
+            # Runs after the response body is sent, when the request's session may be closed
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(Job).where(Job.id == job_id).values(
+                        zip_path=str(zip_path),
+                        zip_size_bytes=size_bytes,
+                        zip_sha256=sha256,
+                        zip_built_at=datetime.utcnow()
+                    )
+                )
+                await db.commit()
+
+        return _stream_zip(members, ZIPS_DIR / f"{job_id}.zip", record_zip)
 
     async def build_job_zip(self, job_id: int) -> Optional[Path]:
         """Build ZIP file for a specific job"""
@@ -32,106 +306,92 @@ class ZipGeneratorService:
         if not job or job.status != "succeeded":
             return None
 
-        result = await self.db.execute(
-            select(Image).where(Image.job_id == job_id)
-        )
-        images = result.scalars().all()
+        members = await self._job_zip_members(job_id)
 
-        if not images:
+        if not members:
             return None
 
-        # Create ZIP directory
-        zip_dir = Path(__file__).parent.parent.parent.parent / "data" / "zips"
-        zip_dir.mkdir(parents=True, exist_ok=True)
-
-        zip_path = zip_dir / f"{job_id}.zip"
-
-        # Create ZIP file
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for image in images:
-                image_path = Path(image.path)
-                if image_path.exists():
-                    zipf.write(image_path, arcname=image_path.name)
-
-        # Compute hash and size
-        sha256 = await self.compute_sha256(zip_path)
-        size_bytes = zip_path.stat().st_size
-
-        # Update job record
-        await self.db.execute(
-            update(Job).where(Job.id == job_id).values(
-                zip_path=str(zip_path),
-                zip_size_bytes=size_bytes,
-                zip_sha256=sha256,
-                zip_built_at=datetime.utcnow()
+        zip_path = ZIPS_DIR / f"{job_id}.zip"
+
+        # Write and hash in a worker thread so the event loop stays free
+        # for SSE clients and other jobs while the ZIP is built
+        members = await _stat_members(members)
+        async with _build_lock:
+            sha256, size_bytes = await asyncio.to_thread(_write_zip_sync, zip_path, members)
+
+            # Update job record
+            await self.db.execute(
+                update(Job).where(Job.id == job_id).values(
+                    zip_path=str(zip_path),
+                    zip_size_bytes=size_bytes,
+                    zip_sha256=sha256,
+                    zip_built_at=datetime.utcnow()
+                )
             )
-        )
-        await self.db.commit()
+            await self.db.commit()
 
         return zip_path
 
     async def build_all_jobs_zip(self) -> Optional[Path]:
         """Build combined ZIP of all images across all jobs"""
-        # Get all images
-        result = await self.db.execute(
-            select(Image).order_by(Image.job_id, Image.created_at)
-        )
-        images = result.scalars().all()
-
-        if not images:
-            return None
-
-        # Create ZIP directory
-        zip_dir = Path(__file__).parent.parent.parent.parent / "data" / "zips"
-        zip_dir.mkdir(parents=True, exist_ok=True)
+        # Hold the build lock from the image query to the metadata upsert so an
+        # invalidation can't land between them
+        async with _build_lock:
+            # Get all image paths (a column projection; no ORM objects needed)
+            result = await self.db.execute(
+                select(Image.path, Image.job_id).order_by(Image.job_id, Image.created_at)
+            )
+            images = result.all()
 
-        zip_path = zip_dir / "all_jobs.zip"
+            if not images:
+                return None
 
-        # Create ZIP file with job subdirectories
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for image in images:
-                image_path = Path(image.path)
-                if image_path.exists():
-                    # Use job_id as subdirectory
-                    arcname = f"job_{image.job_id}/{image_path.name}"
-                    zipf.write(image_path, arcname=arcname)
+            zip_path = ALL_JOBS_ZIP_PATH
 
-        # Compute hash
-        sha256 = await self.compute_sha256(zip_path)
+            # Create ZIP file with job subdirectories in a worker thread
+            members = []
+            for path_str, image_job_id in images:
+                image_path = Path(path_str)
+                # Use job_id as subdirectory
+                members.append((image_path, f"job_{image_job_id}/{image_path.name}"))
+            members = await _stat_members(members)
+            sha256, size_bytes = await asyncio.to_thread(_write_zip_sync, zip_path, members)
 
-        # Store in app_config
-        from ..database import AppConfig
+            # Store in app_config
+            from ..database import AppConfig
 
-        # Update or insert all_jobs_zip metadata
-        await self.db.execute(
-            update(AppConfig).where(AppConfig.key == "all_jobs_zip_path").values(value=str(zip_path))
-        )
-        await self.db.execute(
-            update(AppConfig).where(AppConfig.key == "all_jobs_zip_sha256").values(value=sha256)
-        )
-        await self.db.execute(
-            update(AppConfig).where(AppConfig.key == "all_jobs_zip_built_at").values(value=datetime.utcnow().isoformat())
-        )
-        await self.db.commit()
+            # Upsert all_jobs_zip metadata in one statement (rows are absent on first build
+            # and after invalidation)
+            now = datetime.utcnow()
+            stmt = sqlite_insert(AppConfig).values([
+                {"key": "all_jobs_zip_path", "value": str(zip_path), "updated_at": now},
+                {"key": "all_jobs_zip_sha256", "value": sha256, "updated_at": now},
+                {"key": "all_jobs_zip_size_bytes", "value": str(size_bytes), "updated_at": now},
+                {"key": "all_jobs_zip_built_at", "value": now.isoformat(), "updated_at": now},
+            ])
+            await self.db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[AppConfig.key],
+                    set_={"value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at}
+                )
+            )
+            await self.db.commit()
+            invalidate_config(*ALL_JOBS_ZIP_CONFIG_KEYS)
 
-        return zip_path
+            return zip_path
 
     async def invalidate_all_jobs_cache(self):
         """Invalidate the all-jobs ZIP cache"""
-        zip_path = Path(__file__).parent.parent.parent.parent / "data" / "zips" / "all_jobs.zip"
-
-        if zip_path.exists():
-            zip_path.unlink()
+        async with _build_lock:
+            if ALL_JOBS_ZIP_PATH.exists():
+                ALL_JOBS_ZIP_PATH.unlink()
 
-        # Clear metadata from config
-        from ..database import AppConfig
-        from sqlalchemy import delete
+            # Clear metadata from config
+            from ..database import AppConfig
+            from sqlalchemy import delete
 
-        await self.db.execute(
-            delete(AppConfig).where(AppConfig.key.in_([
-                "all_jobs_zip_path",
-                "all_jobs_zip_sha256",
-                "all_jobs_zip_built_at"
-            ]))
-        )
-        await self.db.commit()
+            await self.db.execute(
+                delete(AppConfig).where(AppConfig.key.in_(ALL_JOBS_ZIP_CONFIG_KEYS))
+            )
+            await self.db.commit()
+            invalidate_config(*ALL_JOBS_ZIP_CONFIG_KEYS)
@@ -46,7 +46,7 @@ function Research() {
       setSessions(data);
 
       // Auto-restore the most recent active session (but don't auto-reconnect stream)
-      const activeSession = data.find(s => s.status === 'active');
+      const activeSession = data.find(s => s.status === 'active' || s.status === 'running');
       if (activeSession) {
         loadSession(activeSession.id);
 
@@ -82,8 +82,13 @@ function Research() {
       const response = await fetch(`${API_BASE}/api/research/sessions/${sessionId}`);
       const data = await response.json();
       setCurrentSession(data);
-      setMessages(data.messages);
-      setThinkingSteps([]);
+      // Persisted reasoning/search steps replay in the activity panel
+      setMessages(data.messages.filter(m => m.role === 'user' || m.role === 'assistant'));
+      setThinkingSteps(
+        data.messages
+          .filter(m => m.role === 'thinking' || m.role === 'web_search')
+          .map(m => ({ type: m.role === 'web_search' ? 'search' : 'thinking', text: m.content }))
+      );
       setCurrentStatus('');
       setAwaitingClarification(false);
     } catch (error) {
@@ -186,9 +191,11 @@ function Research() {
 
     eventSource.addEventListener('thinking', (e) => {
       const data = JSON.parse(e.data);
-      setThinkingSteps(prev => [...prev, { type: 'thinking', text: data.text }]);
+      // Thinking steps arrive batched as an array of texts
+      const texts = data.texts || [data.text];
+      setThinkingSteps(prev => [...prev, ...texts.map(text => ({ type: 'thinking', text }))]);
       // Increment progress slightly with each thinking step (cap at 85%)
-      setResearchProgress(prev => Math.min(prev + 2, 85));
+      setResearchProgress(prev => Math.min(prev + 2 * texts.length, 85));
     });
 
     eventSource.addEventListener('web_search', (e) => {
@@ -205,9 +212,8 @@ function Research() {
       setResearchProgress(prev => Math.min(prev + 2, 85));
     });
 
-    eventSource.addEventListener('result', (e) => {
-      const data = JSON.parse(e.data);
-      setMessages(prev => [...prev, { role: 'assistant', content: data.report, created_at: new Date() }]);
+    eventSource.addEventListener('result', () => {
+      // The report is loaded with the session when the stream finishes
       setCurrentStatus('Research completed!');
       setResearchProgress(100);
     });
@@ -58,7 +58,7 @@ trap cleanup SIGINT SIGTERM
 # Start backend
 echo "🔧 Starting backend on http://localhost:8000..."
 cd backend
-./venv/bin/uvicorn app.main:app --reload --host 0.0.0.0 --port 8000 > ../backend.log 2>&1 &
+./venv/bin/uvicorn app.main:app --reload --host 0.0.0.0 --port 8000 --loop uvloop --http httptools > ../backend.log 2>&1 &
 BACKEND_PID=$!
 cd ..
 
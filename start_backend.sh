@@ -18,4 +18,4 @@ pip install -q -r requirements.txt
 
 # Start server
 echo "Starting backend server on http://localhost:8000"
-uvicorn app.main:app --reload --host 0.0.0.0 --port 8000
+uvicorn app.main:app --reload --host 0.0.0.0 --port 8000 --loop uvloop --http httptools
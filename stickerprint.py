@@ -3,47 +3,696 @@
 import os
 import sys
 import argparse
-import base64
-import time
+import logging
+import mmap
+import binascii
+import hashlib
+import sqlite3
+import asyncio
 import random
+import queue
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
 from io import BytesIO
-from openai import OpenAI, RateLimitError, APIError
+import aiohttp
+import orjson
+
+# Progress goes through logging; its handler lock serializes lines from workers and the writer thread
+_log = logging.getLogger('stickerprint')
+
+# Maximum number of image requests in flight at once
+CONCURRENCY = 5
+
+# With --keys, each API key gets its own process and connection pool running this many requests
+KEY_SHARD_CONCURRENCY = 4
+
+# Universal Sticker Generator Prompt
+# Professional vinyl sticker designer prompt with flat vector/doodle style
+STICKER_SUFFIX = (
+    'flat vector or doodle style with clean lines no shading or photorealism, '
+    'transparent background PNG-ready for cutting, '
+    'isolated composition not touching edges centered within canvas, '
+    'bold outlines for clear cut lines, '
+    'high contrast color palette 2-4 tones, '
+    'cute expressive or aesthetic shape that looks great as a sticker, '
+    'no drop shadows no textures outside the design'
+)
+
+# Images are requested straight from the REST endpoint over one pooled aiohttp session;
+# the pool holds one keep-alive connection per concurrent request
+OPENAI_API_BASE = 'https://api.openai.com/v1'
+OPENAI_IMAGES_URL = f'{OPENAI_API_BASE}/images/generations'
+HTTP_KEEPALIVE_SECONDS = 60
+HTTP_DNS_CACHE_SECONDS = 300
+# Image generation can take minutes; matches the OpenAI client's default timeout
+HTTP_TIMEOUT_SECONDS = 600
+
+# O_DIRECT writes must be whole blocks from an aligned buffer
+DIRECT_IO_ALIGNMENT = 4096
+
+# Adaptive backoff looks at the share of requests that hit 429 over this window
+RATE_WINDOW_SECONDS = 60.0
+
+# --batch runs submit one Batch API job and poll its status at this interval
+BATCH_POLL_SECONDS = 60
+BATCH_FINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+# Consecutive transient failures tolerated while polling before the run gives up
+BATCH_POLL_RETRIES = 5
+# Batch output is downloaded to disk in chunks of this size (each line holds a whole image)
+BATCH_DOWNLOAD_CHUNK = 1024 * 1024
+# At most this many decoded batch results wait on the writer thread at once
+BATCH_SAVES_AHEAD = 32
+
+# The writer thread drains up to this many queued images per wakeup
+WRITE_BATCH_MAX = 16
+
+# Finished prompts are recorded here (inside the output directory) so reruns skip them
+RESUME_DB_NAME = '.stickerprint-resume.sqlite3'
+
+
+class _SanitizeTable(dict):
+    """str.translate table that lowercases alphanumerics/whitespace and maps the rest to '-'"""
+
+    def __missing__(self, codepoint):
+        lowered = chr(codepoint).lower()
+        value = ''.join(c if c.isalnum() or c.isspace() else '-' for c in lowered)
+        self[codepoint] = value
+        return value
+
+
+# Filled lazily per codepoint, so only characters actually seen in prompts are stored
+_SANITIZE_TABLE = _SanitizeTable()
+
+
+class RateLimitError(Exception):
+    """The images endpoint answered 429"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class APIError(Exception):
+    """The images endpoint failed with a non-429 error or the connection broke"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        # HTTP status, or None when the connection itself failed
+        self.status = status
+
+    @property
+    def transient(self):
+        """Worth retrying: a dropped connection, 429 or 5xx"""
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+def image_request_body(prompt):
+    """Request body for one sticker: the user prompt plus the sticker style suffix"""
+    return {
+        'model': 'gpt-image-1',
+        'prompt': f'{prompt} — {STICKER_SUFFIX}',
+        'size': '1024x1024',
+        'quality': 'auto',
+        'output_compression': 100,
+    }
+
+
+def sticker_filename(i, prompt):
+    """Create filename from prompt (sanitized)"""
+    sanitized = '-'.join(prompt.translate(_SANITIZE_TABLE).split())[:50]
+    return f'{i:03d}-{sanitized}.png'
+
+
+def prompt_idem_key(i, prompt):
+    """Stable key for one prompt slot, used for Idempotency-Key and the resume map"""
+    return hashlib.sha256(f'{prompt}|{i}'.encode()).hexdigest()[:32]
+
+
+async def request_image(session, api_key, prompt, idem_key):
+    """POST one generation request and return the base64 PNG from the response"""
+    payload = image_request_body(prompt)
+    # Retries reuse the key, so a request that succeeded behind a 429 isn't billed twice
+    headers = {'Authorization': f'Bearer {api_key}', 'Idempotency-Key': idem_key}
+
+    try:
+        async with session.post(OPENAI_IMAGES_URL, json=payload, headers=headers) as resp:
+            body = await _read_json(resp)
+            if resp.status == 429:
+                raise RateLimitError(_error_message(body, resp.status), resp.headers.get('Retry-After'))
+            if resp.status >= 400:
+                raise APIError(_error_message(body, resp.status), resp.status)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise APIError(f'{type(e).__name__}: {e}') from e
+
+    return body['data'][0]['b64_json']
+
+
+def save_image(filepath, image_base64):
+    """Decode a base64 PNG and write it with O_DIRECT where supported, else a buffered write"""
+    image_bytes = binascii.a2b_base64(image_base64)
+
+    if hasattr(os, 'O_DIRECT'):
+        try:
+            _write_direct(filepath, image_bytes)
+            return
+        except OSError:
+            # Filesystem refused direct I/O (e.g. tmpfs); fall through to a normal write
+            pass
+
+    with open(filepath, 'wb') as f:
+        f.write(image_bytes)
+
+
+def _write_direct(filepath, data):
+    """Write through an aligned mmap buffer with O_DIRECT, bypassing the page cache"""
+    aligned_len = -(-len(data) // DIRECT_IO_ALIGNMENT) * DIRECT_IO_ALIGNMENT
+    fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT, 0o644)
+    try:
+        if aligned_len:
+            # Anonymous mmaps are page-aligned; the zero padding is cut off by ftruncate below
+            with mmap.mmap(-1, aligned_len) as buf:
+                buf[:len(data)] = data
+                view = memoryview(buf)
+                try:
+                    written = 0
+                    while written < aligned_len:
+                        written += os.write(fd, view[written:])
+                finally:
+                    view.release()
+        os.ftruncate(fd, len(data))
+    finally:
+        os.close(fd)
+
+
+class ResumeMap:
+    """SQLite map of idempotency key -> saved sticker, used to skip finished prompts on rerun"""
+
+    def __init__(self, path):
+        # Read on the event loop thread before the run, written only by the writer thread
+        # --keys shards share this file across processes, so wait out their write locks
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS completed (idem_key TEXT PRIMARY KEY, filepath TEXT NOT NULL)'
+        )
+        # --batch jobs still to collect, keyed by the SHA-256 of their input JSONL
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS batches (input_sha256 TEXT PRIMARY KEY, batch_id TEXT NOT NULL)'
+        )
+        self.conn.commit()
+
+    def completed(self):
+        """Return {idem_key: filepath} for every recorded sticker"""
+        return dict(self.conn.execute('SELECT idem_key, filepath FROM completed'))
+
+    def record(self, entries):
+        """Record (idem_key, filepath) pairs in one transaction"""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO completed (idem_key, filepath) VALUES (?, ?)',
+                [(idem_key, str(filepath)) for idem_key, filepath in entries]
+            )
+
+    def batch_for(self, input_sha256):
+        """Return the id of an uncollected batch submitted with this input, if any"""
+        row = self.conn.execute('SELECT batch_id FROM batches WHERE input_sha256 = ?', (input_sha256,)).fetchone()
+        return row[0] if row else None
+
+    def record_batch(self, input_sha256, batch_id):
+        """Remember a submitted batch so an interrupted run polls it instead of resubmitting"""
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO batches (input_sha256, batch_id) VALUES (?, ?)', (input_sha256, batch_id)
+            )
+
+    def forget_batch(self, input_sha256):
+        """Drop a batch once its results are collected (or it ended without any)"""
+        with self.conn:
+            self.conn.execute('DELETE FROM batches WHERE input_sha256 = ?', (input_sha256,))
+
+    def close(self):
+        self.conn.close()
+
+
+class ImageWriter:
+    """Background thread that decodes and saves images in batches, off the event loop"""
+
+    def __init__(self, resume_map=None, max_batch=WRITE_BATCH_MAX):
+        self.queue = queue.Queue()
+        self.resume_map = resume_map
+        self.max_batch = max_batch
+        self.thread = threading.Thread(target=self._run, name='image-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, filepath, image_base64, idem_key):
+        """Queue an image; the returned Future resolves once it is on disk and recorded"""
+        future = Future()
+        self.queue.put((filepath, image_base64, idem_key, future))
+        return future
+
+    def close(self):
+        """Finish queued writes and stop the thread"""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            saved = []
+            stopping = False
+            for item in batch:
+                if item is None:
+                    stopping = True
+                    break
+                filepath, image_base64, idem_key, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    save_image(filepath, image_base64)
+                    saved.append((idem_key, filepath, future))
+                except Exception as e:
+                    future.set_exception(e)
+
+            # One resume-map transaction per batch
+            if saved and self.resume_map:
+                try:
+                    self.resume_map.record((idem_key, filepath) for idem_key, filepath, _ in saved)
+                except sqlite3.Error as e:
+                    _log.warning(f'⚠️  Could not record finished stickers for resume: {str(e)}')
+            for _, _, future in saved:
+                future.set_result(None)
+
+            if stopping:
+                return
+
+
+async def _read_json(resp):
+    """Parse a response body with orjson; error responses that aren't JSON parse as None"""
+    raw = await resp.read()
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        if resp.status >= 400:
+            return None
+        raise
+
+
+def _error_message(body, status):
+    """Pull the message out of an OpenAI error body"""
+    if isinstance(body, dict) and isinstance(body.get('error'), dict):
+        return f'Error code: {status} - {body["error"].get("message")}'
+    return f'Error code: {status}'
+
+
+# Directories already created this process, so repeat calls skip the stat + mkdir
+_ensured_dirs = set()
+
+
+def ensure_dir(path):
+    """Create a directory (and parents) once per process"""
+    if path not in _ensured_dirs:
+        path.mkdir(parents=True, exist_ok=True)
+        _ensured_dirs.add(path)
+
+
+def jitter(s):
+    """Add +/-10% jitter to delay"""
+    return s * random.uniform(0.9, 1.1)
+
+
+async def generate_stickers(api_key, prompts, output_dir, concurrency=CONCURRENCY, indices=None, total=None):
+    """Generate one sticker per prompt, running up to `concurrency` requests at once"""
+    # A --keys shard passes each prompt's position in the whole file (for filenames and
+    # resume keys) and the whole file's prompt count
+    indices = indices or range(1, len(prompts) + 1)
+    total = total or len(prompts)
+    # Adaptive rate limiting variables for tier 3
+    # Adjust starting delay based on your tier limits shown at:
+    # https://platform.openai.com/settings/organization/limits
+    # Request starts are spaced by `delay`; requests themselves overlap
+    base_delay = 5.0      # tier 3: 5s (≈12 RPM) with no 429s - adjust based on your actual limits
+    max_delay = 120.0     # cap backoff
+    state = {
+        'delay': base_delay,
+        'next_start': 0.0,    # loop time before which no new request may start
+        'limited': 0,         # 429s currently in `outcomes`
+    }
+    outcomes = deque()    # (loop time, hit 429) for requests in the last RATE_WINDOW_SECONDS
+    lock = asyncio.Lock()
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    def record_outcome(rate_limited):
+        """Update the windowed 429 rate p and set delay = base_delay / (1 - p); call under lock"""
+        now = loop.time()
+        outcomes.append((now, rate_limited))
+        state['limited'] += rate_limited
+        while outcomes[0][0] < now - RATE_WINDOW_SECONDS:
+            _, expired_limited = outcomes.popleft()
+            state['limited'] -= expired_limited
+
+        p = state['limited'] / len(outcomes)
+        state['delay'] = max_delay if p >= 1 else min(max_delay, base_delay / (1 - p))
+        return p
+
+    async def throttle():
+        """Proactive throttling with jitter (the first request goes out immediately)"""
+        async with lock:
+            now = loop.time()
+            start = max(now, state['next_start'])
+            state['next_start'] = start + jitter(state['delay'])
+        if start > now:
+            _log.info(f'⏳ Waiting {start - now:.1f}s before next request...')
+            await asyncio.sleep(start - now)
+
+    async def worker(i, prompt):
+        idem_key = prompt_idem_key(i, prompt)
+        previous_file = completed.get(idem_key)
+        if previous_file and Path(previous_file).exists():
+            _log.info(f'⏭️  Already generated: {Path(previous_file).name}')
+            return
+
+        attempt = 0
+        while True:
+            attempt += 1
+            async with semaphore:
+                if attempt == 1:
+                    _log.info(f'[{i}/{total}] Generating: "{prompt}"')
+                await throttle()
+
+                try:
+                    # gpt-image-1 returns base64 encoded image data
+                    image_base64 = await request_image(session, api_key, prompt, idem_key)
+
+                    filename = sticker_filename(i, prompt)
+                    filepath = output_dir / filename
+
+                    # Decode and write on the writer thread; the slot is freed before the write finishes
+                    pending_write = writer.submit(filepath, image_base64, idem_key)
+
+                    # Successful request - speed back up as 429s age out of the window
+                    async with lock:
+                        previous_delay = state['delay']
+                        record_outcome(False)
+                        if state['delay'] < previous_delay:
+                            _log.info(f'🚀 Rate limit confidence increased, reducing delay to {state["delay"]:.1f}s')
+                    break
+
+                except RateLimitError as e:
+                    # Prefer server guidance if available
+                    retry_after = e.retry_after
+
+                    async with lock:
+                        p = record_outcome(True)
+                        if retry_after:
+                            wait_time = jitter(float(retry_after))
+                            _log.warning(f'⚠️  Rate limit hit. Server says retry after {retry_after}s. Waiting {wait_time:.1f}s...')
+                        else:
+                            wait_time = jitter(state['delay'])
+                            _log.warning(f'⚠️  Rate limit hit ({p:.0%} of recent requests). New delay: {state["delay"]:.1f}s. Waiting {wait_time:.1f}s...')
+                        # Hold back every worker, not just this one
+                        state['next_start'] = max(state['next_start'], loop.time() + wait_time)
+
+                except APIError as e:
+                    # Transient 5xx errors: push back the next request start, then move on
+                    wait_time = jitter(min(max_delay, state['delay'] * 1.5))
+                    _log.warning(f'⚠️  API error (likely transient): {str(e)}')
+                    _log.info(f'⏳ Backing off for {wait_time:.1f}s before continuing...')
+                    async with lock:
+                        state['next_start'] = max(state['next_start'], loop.time() + wait_time)
+                    _log.error(f'❌ Skipping: "{prompt}"\n')
+                    return
+
+                except Exception as e:
+                    _log.error(f'❌ Failed to generate image: {str(e)}\n')
+                    return
+
+            # Wait out the backoff without holding a slot, so other workers keep theirs busy
+            await asyncio.sleep(wait_time)
+            # Retry this prompt once the backoff has passed
+            _log.info(f'🔄 Retrying: "{prompt}"')
+
+        # Awaited outside the semaphore so the next request overlaps this decode + write
+        try:
+            await asyncio.wrap_future(pending_write)
+            _log.info(f'✅ Saved: {filename}')
+        except Exception as e:
+            _log.error(f'❌ Failed to save image: {str(e)}\n')
+
+    # One session (and keep-alive connection pool) shared by every worker
+    connector = aiohttp.TCPConnector(
+        limit=concurrency,
+        keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+        ttl_dns_cache=HTTP_DNS_CACHE_SECONDS
+    )
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS)
+    resume_map = ResumeMap(output_dir / RESUME_DB_NAME)
+    completed = resume_map.completed()
+    writer = ImageWriter(resume_map)
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            await asyncio.gather(*(worker(i, prompt) for i, prompt in zip(indices, prompts)))
+    finally:
+        writer.close()
+        resume_map.close()
+
+
+async def _api_call(session, method, url, api_key, **kwargs):
+    """Call an OpenAI REST endpoint and return its JSON body, raising APIError on failure"""
+    headers = {'Authorization': f'Bearer {api_key}'}
+    try:
+        async with session.request(method, url, headers=headers, **kwargs) as resp:
+            body = await _read_json(resp)
+            if resp.status >= 400:
+                raise APIError(_error_message(body, resp.status), resp.status)
+            return body
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise APIError(f'{type(e).__name__}: {e}') from e
+
+
+async def _get_batch(session, api_key, batch_id):
+    """Fetch a batch's current state, retrying transient failures"""
+    for attempt in range(BATCH_POLL_RETRIES + 1):
+        try:
+            return await _api_call(session, 'GET', f'{OPENAI_API_BASE}/batches/{batch_id}', api_key)
+        except APIError as e:
+            if not e.transient or attempt == BATCH_POLL_RETRIES:
+                raise
+            _log.warning(f'⚠️  Could not check batch {batch_id} ({str(e)}); retrying...')
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+
+
+async def generate_stickers_batch(api_key, prompts, output_dir):
+    """Generate stickers through one Batch API job and return how many prompts got no sticker"""
+    resume_map = ResumeMap(output_dir / RESUME_DB_NAME)
+    completed = resume_map.completed()
+
+    # custom_id -> (index, prompt, idempotency key) for every prompt still to generate
+    pending = {}
+    lines = []
+    for i, prompt in enumerate(prompts, 1):
+        idem_key = prompt_idem_key(i, prompt)
+        previous_file = completed.get(idem_key)
+        if previous_file and Path(previous_file).exists():
+            _log.info(f'⏭️  Already generated: {Path(previous_file).name}')
+            continue
+        custom_id = f'p-{i:05d}'
+        pending[custom_id] = (i, prompt, idem_key)
+        lines.append(orjson.dumps({
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': '/v1/images/generations',
+            'body': image_request_body(prompt),
+        }))
+
+    if not pending:
+        resume_map.close()
+        return 0
+
+    input_jsonl = b'\n'.join(lines)
+    input_sha256 = hashlib.sha256(input_jsonl).hexdigest()
+    output_path = output_dir / '.stickerprint-batch-output.jsonl'
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=HTTP_TIMEOUT_SECONDS)
+    writer = ImageWriter(resume_map)
+    try:
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            # A rerun with the same outstanding prompts picks up the batch it already paid for
+            batch = None
+            batch_id = resume_map.batch_for(input_sha256)
+            if batch_id:
+                try:
+                    batch = await _get_batch(session, api_key, batch_id)
+                    _log.info(f'📦 Resuming batch {batch_id} with {len(pending)} prompt(s)')
+                except APIError as e:
+                    if e.transient:
+                        raise
+                    _log.warning(f'⚠️  Could not resume batch {batch_id} ({str(e)}); submitting a new one')
+                    resume_map.forget_batch(input_sha256)
+
+            if batch is None:
+                form = aiohttp.FormData()
+                form.add_field('purpose', 'batch')
+                form.add_field('file', input_jsonl, filename='stickers.jsonl', content_type='application/jsonl')
+                input_file = await _api_call(session, 'POST', f'{OPENAI_API_BASE}/files', api_key, data=form)
+
+                batch = await _api_call(session, 'POST', f'{OPENAI_API_BASE}/batches', api_key, json={
+                    'input_file_id': input_file['id'],
+                    'endpoint': '/v1/images/generations',
+                    'completion_window': '24h',
+                })
+                resume_map.record_batch(input_sha256, batch['id'])
+                _log.info(f'📦 Submitted batch {batch["id"]} with {len(pending)} prompt(s)')
+
+            while batch['status'] not in BATCH_FINAL_STATUSES:
+                await asyncio.sleep(BATCH_POLL_SECONDS)
+                batch = await _get_batch(session, api_key, batch['id'])
+                counts = batch.get('request_counts') or {}
+                _log.info(
+                    f'⏳ Batch {batch["status"]}: {counts.get("completed", 0)}/{counts.get("total", len(pending))} done, '
+                    f'{counts.get("failed", 0)} failed'
+                )
+
+            if not batch.get('output_file_id'):
+                _log.error(f'❌ Batch {batch["id"]} ended as {batch["status"]} with no output')
+                resume_map.forget_batch(input_sha256)
+                return len(pending)
+
+            # Spool the output to disk; every line carries a full base64 image
+            url = f'{OPENAI_API_BASE}/files/{batch["output_file_id"]}/content'
+            try:
+                async with session.get(url, headers={'Authorization': f'Bearer {api_key}'}) as resp:
+                    if resp.status >= 400:
+                        raise APIError(f'Error code: {resp.status}', resp.status)
+                    with open(output_path, 'wb') as f:
+                        async for chunk in resp.content.iter_chunked(BATCH_DOWNLOAD_CHUNK):
+                            f.write(chunk)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise APIError(f'{type(e).__name__}: {e}') from e
+
+        failed = 0
+        saves = deque()
+
+        async def finish_save():
+            nonlocal failed
+            filename, pending_write = saves.popleft()
+            try:
+                await asyncio.wrap_future(pending_write)
+                _log.info(f'✅ Saved: {filename}')
+            except Exception as e:
+                failed += 1
+                _log.error(f'❌ Failed to save image: {str(e)}\n')
+
+        with open(output_path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                result = orjson.loads(line)
+                i, prompt, idem_key = pending.pop(result['custom_id'])
+                response = result.get('response') or {}
+                if response.get('status_code') != 200:
+                    error = result.get('error') or (response.get('body') or {}).get('error') or {}
+                    _log.error(f'❌ Failed to generate image for "{prompt}": {error.get("message", "unknown error")}\n')
+                    failed += 1
+                    continue
+                filename = sticker_filename(i, prompt)
+                image_base64 = response['body']['data'][0]['b64_json']
+                saves.append((filename, writer.submit(output_dir / filename, image_base64, idem_key)))
+                # Wait for older saves so decoded images don't pile up in memory
+                if len(saves) >= BATCH_SAVES_AHEAD:
+                    await finish_save()
+
+        while saves:
+            await finish_save()
+
+        for _, prompt, _ in pending.values():
+            _log.error(f'❌ No batch result for "{prompt}"\n')
+        failed += len(pending)
+        resume_map.forget_batch(input_sha256)
+        return failed
+    finally:
+        writer.close()
+        resume_map.close()
+        output_path.unlink(missing_ok=True)
+
+
+def _run_key_shard(api_key, shard, output_dir, total):
+    """Process-pool entry point: generate one API key's share of the prompts"""
+    # Spawned (not forked) children start without the parent's log handler
+    if not _log.handlers:
+        _configure_logging()
+    indices = [i for i, _ in shard]
+    prompts = [prompt for _, prompt in shard]
+    asyncio.run(generate_stickers(api_key, prompts, output_dir, KEY_SHARD_CONCURRENCY, indices, total))
+
+
+def generate_stickers_sharded(api_keys, prompts, output_dir):
+    """Split prompts round-robin across API keys, one process (and quota) per key"""
+    shards = [[] for _ in api_keys]
+    for i, prompt in enumerate(prompts, 1):
+        shards[(i - 1) % len(api_keys)].append((i, prompt))
+
+    jobs = [(api_key, shard, output_dir, len(prompts)) for api_key, shard in zip(api_keys, shards) if shard]
+    with multiprocessing.Pool(len(jobs)) as pool:
+        pool.starmap(_run_key_shard, jobs)
+
+
+def _configure_logging():
+    """Send progress lines to stdout unadorned, as plain prints did"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    _log.addHandler(handler)
+    _log.setLevel(logging.INFO)
+    _log.propagate = False
+
 
 def main():
+    _configure_logging()
+
     parser = argparse.ArgumentParser(
         description='Generate sticker images from text prompts using OpenAI GPT Image'
     )
     parser.add_argument('-f', '--file', required=True, help='Path to text file containing prompts (one per line)')
     parser.add_argument('-o', '--output', help='Output directory for generated images (defaults to current directory)')
     parser.add_argument('-k', '--api-key', help='OpenAI API key (or set OPENAI_API_KEY environment variable)')
+    parser.add_argument('--batch', action='store_true', help='Submit all prompts as one Batch API job (cheaper, finishes within 24h)')
+    parser.add_argument('--keys', help='Comma-separated OpenAI API keys; prompts are split across one process per key')
 
     args = parser.parse_args()
 
-    # Get API key
+    # Get API key(s)
+    api_keys = [key.strip() for key in args.keys.split(',') if key.strip()] if args.keys else []
     api_key = args.api_key or os.environ.get('OPENAI_API_KEY')
-    if not api_key:
-        print('❌ Error: OpenAI API key is required. Set OPENAI_API_KEY environment variable or use --api-key option.')
+    if not api_key and not api_keys:
+        _log.error('❌ Error: OpenAI API key is required. Set OPENAI_API_KEY environment variable or use --api-key option.')
         sys.exit(1)
-
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
+    if api_keys and args.batch:
+        _log.error('❌ Error: --keys cannot be combined with --batch.')
+        sys.exit(1)
+    if len(api_keys) == 1:
+        api_key, api_keys = api_keys[0], []
 
     # Read prompts file
     prompts_file = Path(args.file).resolve()
     if not prompts_file.exists():
-        print(f'❌ Error: File not found: {prompts_file}')
+        _log.error(f'❌ Error: File not found: {prompts_file}')
         sys.exit(1)
 
-    with open(prompts_file, 'r') as f:
-        prompts = [line.strip() for line in f if line.strip()]
+    prompts = [prompt for line in prompts_file.read_text().splitlines() if (prompt := line.strip())]
 
     if not prompts:
-        print('❌ Error: No prompts found in file.')
+        _log.error('❌ Error: No prompts found in file.')
         sys.exit(1)
 
-    print(f'📝 Found {len(prompts)} prompt(s) to process\n')
+    _log.info(f'📝 Found {len(prompts)} prompt(s) to process\n')
 
     # Setup output directory
     if args.output:
@@ -52,108 +701,25 @@ def main():
         # Default to Stickers/ folder in project root
         output_dir = Path.cwd() / 'Stickers'
 
-    output_dir.mkdir(parents=True, exist_ok=True)
+    ensure_dir(output_dir)
 
-    print(f'📁 Output directory: {output_dir}\n')
-
-    # Adaptive rate limiting variables for tier 3
-    # Adjust starting delay based on your tier limits shown at:
-    # https://platform.openai.com/settings/organization/limits
-    delay = 5.0           # tier 3: start at 5s (≈12 RPM) - adjust based on your actual limits
-    max_delay = 120.0     # cap backoff
-    success_streak = 0
-
-    def jitter(s):
-        """Add +/-10% jitter to delay"""
-        return s * random.uniform(0.9, 1.1)
-
-    # Process each prompt
-    for i, prompt in enumerate(prompts, 1):
-        print(f'[{i}/{len(prompts)}] Generating: "{prompt}"')
-
-        # Proactive throttling with jitter
-        if i > 1:  # skip delay for first request
-            sleep_time = jitter(delay)
-            print(f'⏳ Waiting {sleep_time:.1f}s before next request...')
-            time.sleep(sleep_time)
+    _log.info(f'📁 Output directory: {output_dir}\n')
 
+    if args.batch:
         try:
-            # Universal Sticker Generator Prompt
-            # Professional vinyl sticker designer prompt with flat vector/doodle style
-            enhanced_prompt = (
-                f'{prompt} — '
-                f'flat vector or doodle style with clean lines no shading or photorealism, '
-                f'transparent background PNG-ready for cutting, '
-                f'isolated composition not touching edges centered within canvas, '
-                f'bold outlines for clear cut lines, '
-                f'high contrast color palette 2-4 tones, '
-                f'cute expressive or aesthetic shape that looks great as a sticker, '
-                f'no drop shadows no textures outside the design'
-            )
-
-            response = client.images.generate(
-                model='gpt-image-1',
-                prompt=enhanced_prompt,
-                size='1024x1024',
-                quality='auto',
-                output_compression=100
-            )
-
-            # gpt-image-1 returns base64 encoded image data
-            image_base64 = response.data[0].b64_json
-            image_bytes = base64.b64decode(image_base64)
-
-            # Create filename from prompt (sanitized)
-            sanitized = ''.join(c if c.isalnum() or c.isspace() else '-' for c in prompt.lower())
-            sanitized = '-'.join(sanitized.split())[:50]
-            filename = f'{str(i).zfill(3)}-{sanitized}.png'
-            filepath = output_dir / filename
-
-            with open(filepath, 'wb') as f:
-                f.write(image_bytes)
-
-            print(f'✅ Saved: {filename}')
-
-            # Successful request - cautiously speed up after consecutive successes
-            success_streak += 1
-            if success_streak >= 5 and delay > 2.0:
-                delay = max(2.0, delay * 0.9)
-                print(f'🚀 Rate limit confidence increased, reducing delay to {delay:.1f}s')
-                success_streak = 0
-
-        except RateLimitError as e:
-            success_streak = 0
-            # Prefer server guidance if available
-            retry_after = None
-            if hasattr(e, 'response') and e.response is not None:
-                retry_after = e.response.headers.get('retry-after')
-
-            if retry_after:
-                wait_time = jitter(float(retry_after))
-                print(f'⚠️  Rate limit hit. Server says retry after {retry_after}s. Waiting {wait_time:.1f}s...')
-                time.sleep(wait_time)
-            else:
-                delay = min(max_delay, delay * 2.0)
-                wait_time = jitter(delay)
-                print(f'⚠️  Rate limit hit. Backing off exponentially. New delay: {delay:.1f}s. Waiting {wait_time:.1f}s...')
-                time.sleep(wait_time)
-
-            # Retry this prompt (decrement counter)
-            print(f'🔄 Retrying: "{prompt}"')
-            continue
-
+            failed = asyncio.run(generate_stickers_batch(api_key, prompts, output_dir))
         except APIError as e:
-            # Transient 5xx errors: brief backoff then continue
-            wait_time = jitter(min(max_delay, delay * 1.5))
-            print(f'⚠️  API error (likely transient): {str(e)}')
-            print(f'⏳ Backing off for {wait_time:.1f}s before continuing...')
-            time.sleep(wait_time)
-            print(f'❌ Skipping: "{prompt}"\n')
-
-        except Exception as e:
-            print(f'❌ Failed to generate image: {str(e)}\n')
+            _log.error(f'❌ Error: Batch run failed: {str(e)}')
+            sys.exit(1)
+        if failed:
+            _log.error(f'\n❌ {failed} of {len(prompts)} sticker(s) were not generated; rerun to retry them')
+            sys.exit(1)
+    elif api_keys:
+        generate_stickers_sharded(api_keys, prompts, output_dir)
+    else:
+        asyncio.run(generate_stickers(api_key, prompts, output_dir))
 
-    print(f'\n🎉 Complete! Generated {len(prompts)} sticker(s) in {output_dir}')
+    _log.info(f'\n🎉 Complete! Generated {len(prompts)} sticker(s) in {output_dir}')
 
 if __name__ == '__main__':
     main()
@@ -8,8 +8,8 @@ from pathlib import Path
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent / "backend"))
 
-from app.database import AsyncSessionLocal, GeneratedPromptFile, PromptQueue, PromptsFile
-from sqlalchemy import select
+from app.database import AsyncSessionLocal, GeneratedPromptFile, PromptQueue, PromptsFile, Job
+from sqlalchemy import select, update, delete
 
 
 async def test_queue_flow():
@@ -76,18 +76,24 @@ async def test_queue_flow():
 
         print("\n✅ Test completed successfully!" if result else "\n❌ Test failed!")
 
-        # Cleanup
+        # Cleanup (bulk statements in one transaction; file unlinks run concurrently)
         print("\nCleaning up test data...")
-        if updated_queue:
-            await db.delete(updated_queue)
-        for pf in prompts_files:
-            await db.delete(pf)
-            # Delete copied file
-            if Path(pf.path).exists():
-                Path(pf.path).unlink()
-        await db.delete(gen_file)
+        prompts_file_ids = [pf.id for pf in prompts_files]
+        await db.execute(delete(PromptQueue).where(PromptQueue.id == queue_item.id))
+        if prompts_file_ids:
+            # Bulk delete skips the ORM's nulling of Job.prompts_file_id, so do it explicitly
+            await db.execute(
+                update(Job).where(Job.prompts_file_id.in_(prompts_file_ids)).values(prompts_file_id=None)
+            )
+            await db.execute(delete(PromptsFile).where(PromptsFile.id.in_(prompts_file_ids)))
+        await db.execute(delete(GeneratedPromptFile).where(GeneratedPromptFile.id == gen_file.id))
         await db.commit()
 
+        # Delete copied files
+        await asyncio.gather(*(
+            asyncio.to_thread(Path(pf.path).unlink, missing_ok=True) for pf in prompts_files
+        ))
+
         # Delete original test file
         if test_file_path.exists():
             test_file_path.unlink()